@@ -3,16 +3,23 @@ import pandas as pd
 from pandas import DataFrame
 import click 
 import json
+import os
+import sys
 from pathlib import Path
 from lxml import etree
 import logging
 from logging import getLogger
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, lru_cache
+from importlib.util import find_spec
 from lyterati_utils.doi_parser import Parser
 from lyterati_utils.name_parser import AuthorParser
-import re
-from lyterati_utils.elements_types import SourceHeading, ElementsObjectID, ElementsMapping
+from lyterati_utils.elements_types import SourceHeading, ElementsObjectID, DeferredObjectID, ElementsMapping
 import yaml
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 
 
 logger = logging.getLogger(__name__)
@@ -24,143 +31,315 @@ logging.captureWarnings(True)
 with open('./migration-config.yml') as f:
     CONFIG = yaml.load(f, Loader=yaml.FullLoader)
 
+# Columns added to the Lyterati reports that are converted to categoricals after loading
+CATEGORICAL_FIELDS = ['school_code', 'report_code', 'category']
+
+# Pattern for user IDs in files of missing IDs
+GWID_PATTERN = r'G[0-9]{8}'
+
+# The Rust-based calamine reader is much faster than openpyxl for Excel files, but python-calamine is an optional dependency
+EXCEL_ENGINE = 'calamine' if find_spec('python_calamine') else 'openpyxl'
+
+# Below this many rows, mapping for Elements in a single process is faster than starting a pool of workers
+PARALLEL_MIN_ROWS = 2000
+
 def load_ids_from_profiles() -> DataFrame:
     '''
     Loads data from the fields in PROFILE_FIELDS for each row in the file LYTERATI_PROFILE_XML. Returns as a DataFrame, one row per user record.
+    The result is cached as a Parquet file alongside the XML, which is used instead of the XML as long as it was made from an XML file with the same modification time and size, and has the same fields.
     '''
-    parser = etree.XMLParser(recover=True)
-    doc = etree.parse(CONFIG['id_source'], parser=parser)
-    rows = doc.xpath('//row')
-    records = [row.xpath('field') for row in rows]
-    records = [ { field.get('name'): field.text for field in record
-                if field.get('name') in CONFIG['profile_fields'] }  
-              for record in records ]
+    profile_fields = set(CONFIG['profile_fields'])
+    path_to_xml = Path(CONFIG['id_source'])
+    cache = path_to_xml.with_suffix('.parquet')
+    # Identifies the version of the XML the cache was made from. A copy that keeps the original's modification time (cp -p, rsync, unzip) may still differ in size.
+    xml_stat = path_to_xml.stat()
+    source_metadata = {b'source_mtime_ns': str(xml_stat.st_mtime_ns).encode(), b'source_size': str(xml_stat.st_size).encode()}
+    if cache.exists():
+        try:
+            if source_metadata.items() <= (pq.read_schema(cache).metadata or {}).items():
+                ids = pd.read_parquet(cache)
+                if set(ids.columns) == profile_fields:
+                    logger.info(f'Loaded {len(ids)} records from {cache}')
+                    return ids
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f'Unable to read the Parquet copy of {path_to_xml} ({e}); parsing the XML instead.')
+    records = []
+    # Values such as the college and department repeat across many rows; keep one copy of each until the frame is built
+    interned = {}
+    # Stream the rows, rather than building the whole document tree in memory
+    for _, row in etree.iterparse(CONFIG['id_source'], events=('end',), tag='row', recover=True):
+        records.append({ field.get('name'): interned.setdefault(field.text, field.text) for field in row.iterchildren('field')
+                        if field.get('name') in profile_fields })
+        # Release the row and any preceding siblings once they've been read
+        row.clear()
+        while row.getprevious() is not None:
+            del row.getparent()[0]
     logger.info(f'Found {len(records)} records in {CONFIG["id_source"]}')
-    return DataFrame.from_records(records)
+    # Fix the schema up front, so a field absent from every row still appears as a column
+    ids = DataFrame.from_records(records, columns=CONFIG['profile_fields']).convert_dtypes(dtype_backend='pyarrow')
+    table = pa.Table.from_pandas(ids, preserve_index=False)
+    # Written to a temporary file first and then moved into place, so that an interrupted write doesn't leave a truncated cache behind
+    tmp_cache = cache.with_name(cache.name + '.tmp')
+    try:
+        pq.write_table(table.replace_schema_metadata({**table.schema.metadata, **source_metadata}), tmp_cache, compression='zstd')
+        os.replace(tmp_cache, cache)
+    except OSError as e:
+        logger.warning(f'Unable to save a Parquet copy of {path_to_xml} ({e}).')
+    return ids
 
-def load_lyterati_report(path_to_lyterati_file: str) -> DataFrame:
-    '''Loads a CSV or Excel file containing one set of Lyterati records. File names are expected to conform to the format: "{SCHOOL CODE} {Report Type}. Adds the school code and report type as columns to the returned DataFrame. It is assumed that an Excel file will contain all the data on a single sheet/tab.'''
+def normalize_column_name(column: str) -> str:
+    '''Normalizes column names from the Lyterati reports to lower-case, underscore-separated'''
+    return column.lower().replace(' ', '_')
+
+def to_numpy_dtypes(df: DataFrame, bool_with_nulls: str='object') -> DataFrame:
+    '''Converts Arrow-backed columns, other than strings, to the NumPy dtypes pandas' default readers would give them: int64 for integers without nulls, float64 for other numbers, datetime64 for dates, and bool for booleans without nulls. Booleans with nulls take the bool_with_nulls dtype: the Excel reader gives them float64 (1.0 for True), where the CSV reader keeps True (object).
+    Object IDs are minted from these values as written to CSV, so they must be formatted as before: Arrow keeps a year with nulls in the column as 2014, where NumPy has 2014.0, and writes a date from Excel as 2014-01-01 00:00:00, where NumPy has 2014-01-01.'''
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        if not isinstance(dtype, pd.ArrowDtype):
+            continue
+        arrow_type = dtype.pyarrow_dtype
+        has_nulls = df[column].isnull().any()
+        if pa.types.is_integer(arrow_type):
+            dtypes[column] = 'float64' if has_nulls else 'int64'
+        elif pa.types.is_floating(arrow_type) or pa.types.is_null(arrow_type):
+            dtypes[column] = 'float64'
+        elif pa.types.is_boolean(arrow_type):
+            dtypes[column] = bool_with_nulls if has_nulls else 'bool'
+        elif pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+            dtypes[column] = 'datetime64[ns]'
+    return df.astype(dtypes) if dtypes else df
+
+def load_lyterati_report(path_to_lyterati_file: str, usecols: Optional[list[str]]=None) -> DataFrame:
+    '''Loads a CSV or Excel file containing one set of Lyterati records. File names are expected to conform to the format: "{SCHOOL CODE} {Report Type}. Adds the school code and report type as columns to the returned DataFrame. It is assumed that an Excel file will contain all the data on a single sheet/tab. If usecols is supplied, only those columns (named in their normalized form, e.g., first_name) will be loaded.'''
     logger.info(f'Loading data from {path_to_lyterati_file}')
+    if usecols:
+        usecols = set(usecols)
+        select_columns = lambda c: normalize_column_name(c) in usecols
+    else:
+        select_columns = None
+    # Use Arrow-backed dtypes, which are faster and more compact for string data
     if path_to_lyterati_file.endswith('xlsx'):
-        df = pd.read_excel(path_to_lyterati_file)
+        df = pd.read_excel(path_to_lyterati_file, engine=EXCEL_ENGINE, dtype_backend='pyarrow', usecols=select_columns)
+        df = to_numpy_dtypes(df, bool_with_nulls='float64')
     else:
-        df = pd.read_csv(path_to_lyterati_file)
+        # Not the pyarrow engine, which infers dates and times from text and writes them back in another format (10:00 as 10:00:00)
+        df = pd.read_csv(path_to_lyterati_file, dtype_backend='pyarrow', usecols=select_columns)
+        df = to_numpy_dtypes(df)
     school_code, report_code = Path(path_to_lyterati_file).stem.split(maxsplit=1) # Split on the first space only
     df['school_code'] = school_code
     df['report_code'] = report_code
-    df.columns = [c.lower().replace(' ', '_') for c in df.columns] # normalize column name formatting
+    df.columns = [normalize_column_name(c) for c in df.columns] # normalize column name formatting
     return df.drop_duplicates() # Remove exact duplicate entries within each report
 
-def load_reports(path_to_lyterati_files: str, map_report_types: bool=True, exclude: Optional[list]=None) -> DataFrame:
-    '''Given a path to a directory containing Lyterati reports, which may be in CSV or Excel format, it will load either all files of those formats, or only those whose names not in the optional exclude list. If the map_report_types argument is supplied,the LYTERATI_TYPE_MAPPING will be used to add the report category as an additional column. All files are concatenated into a single DataFrame.'''
+def load_reports(path_to_lyterati_files: str, map_report_types: bool=True, exclude: Optional[list]=None, usecols: Optional[list[str]]=None) -> DataFrame:
+    '''Given a path to a directory containing Lyterati reports, which may be in CSV or Excel format, it will load either all files of those formats, or only those whose names not in the optional exclude list. If the map_report_types argument is supplied,the LYTERATI_TYPE_MAPPING will be used to add the report category as an additional column. If usecols is supplied, only those columns will be loaded from each report. All files are concatenated into a single DataFrame.'''
     path_to_lyterati_files = Path(path_to_lyterati_files)
-    reports = pd.DataFrame()
     if map_report_types:
-        report_type_mapping = load_mapping()
+        report_type_mapping = load_mapping(CONFIG['lyterati_type_mapping'])
     else:
         report_type_mapping = {}
-    for file in list(path_to_lyterati_files.glob('*.xlsx')) + list(path_to_lyterati_files.glob('*.csv')):
-        if file.stem.startswith('_'):
-            continue # skip files that start with an underscore
-        # Skip files that match values passed in with the --exclude cli option
-        if not exclude or not [f for f in exclude if f.lower() in file.stem.lower()]:
-            df = load_lyterati_report(str(file))
-            if report_type_mapping:
-                try:
-                    df['category'] = df.report_code.apply(lambda x: report_type_mapping[x])
-                except KeyError as e:
-                    logger.error(f'Unable to map report type for {file}. Not such category {str(e)} in {CONFIG["lyterati_type_mapping"]}')
-                    return pd.DataFrame()
-            reports = pd.concat([reports, df])
-    return reports
+    # Lower-case the exclusions once, rather than for every file
+    exclude = [f.lower() for f in exclude] if exclude else []
+    # A single pass over the directory; sorted so that the order of the concatenated reports is stable
+    files = sorted( file for file in path_to_lyterati_files.iterdir() 
+                   if file.suffix in ('.xlsx', '.csv') and file.is_file()
+                   # skip files that start with an underscore, and files that match values passed in with the --exclude cli option
+                   and not file.stem.startswith('_') and not any(f in file.stem.lower() for f in exclude) )
+    load = partial(load_lyterati_report, usecols=usecols)
+    if len(files) < 2:
+        # Not worth starting a pool of workers for a single file
+        dfs = [load(str(file)) for file in files]
+    else:
+        # Parsing is CPU-bound and independent for each file, so load the files in parallel (preserving their order)
+        with ProcessPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as executor:
+            dfs = list(executor.map(load, [str(file) for file in files]))
+    if report_type_mapping:
+        for file, df in zip(files, dfs):
+            categories = df.report_code.map(report_type_mapping)
+            if categories.isnull().any():
+                missing = list(df.loc[categories.isnull(), 'report_code'].unique())
+                logger.error(f'Unable to map report type for {file}. No such category {missing} in {CONFIG["lyterati_type_mapping"]}')
+                return pd.DataFrame()
+            df['category'] = categories
+    if not dfs:
+        return pd.DataFrame()
+    # These columns have only a handful of distinct values and are used for grouping. Converting them per file, with the categories shared across files, 
+    # means the concatenated columns remain categorical, without building them as strings for all the rows and then copying the whole frame to convert them.
+    dfs = to_categorical(dfs, [c for c in CATEGORICAL_FIELDS if c in dfs[0].columns])
+    # Concatenate once at the end, instead of copying the accumulated rows on every file
+    return pd.concat(dfs, ignore_index=True, copy=False)
+
+def to_categorical(dfs: list[DataFrame], columns: list[str]) -> list[DataFrame]:
+    '''Converts the given columns to a categorical dtype, with the categories shared across all the supplied DataFrames, so that merges and groupings on those columns can use the category codes.'''
+    # The union of the distinct values in each DataFrame, in order of appearance, without concatenating the full columns
+    dtypes = { c: pd.CategoricalDtype(pd.concat([pd.Series(df[c].dropna().unique()) for df in dfs]).unique()) for c in columns }
+    return [df.astype(dtypes) for df in dfs]
 
 def merge_ids_with_reports(reports: DataFrame, ids: DataFrame) -> DataFrame:
     '''It is assumed that both arguments will have the columns in common listed in MERGED_FIELDS. Reports are joined to ids with a LEFT JOIN, leaving nulls for the identifier field where no match is found. If column_map is provided, it will be applied to ids before merging.'''
     if CONFIG.get('profile_field_map'):
         ids = ids.rename(columns=CONFIG['profile_field_map'])
-    merged = reports.merge(ids, on=CONFIG['merge_fields'], how='left')
+    # Joining on categoricals with identical categories compares integer codes rather than strings
+    # Identical profile records would otherwise duplicate every matching report row
+    ids = ids.drop_duplicates()
+    reports, ids = to_categorical([reports, ids], CONFIG['merge_fields'])
+    merged = reports.merge(ids, on=CONFIG['merge_fields'], how='left', copy=False)
     logger.info(f'Merged {len(merged)} records with profiles. {len(merged.loc[~merged[CONFIG["profile_id_field"]].isnull()])} matches found.')
     if len(merged) > len(reports):
         logger.warning(f'Merging has created duplicates.{len(merged) - len(reports)} are potential duplicates.')
     return merged
 
+def write_csv(df: DataFrame, path_to_file: str, index: bool=False):
+    '''Writes the DataFrame to CSV with Arrow's CSV writer, which is considerably faster than DataFrame.to_csv. Arrow quotes strings and formats values differently from pandas, so this is used only for the stats files, which are numeric; the files for import into Elements are written with DataFrame.to_csv.'''
+    if index:
+        df = df.reset_index()
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), str(path_to_file))
+
+def save_data(df: DataFrame, path_to_file: Path):
+    '''Saves the Lyterati data for migration to the provided CSV path, and a Parquet copy alongside it (with the same name), for faster loading with load_data.'''
+    # Written with pandas: object IDs are minted from these values as re-read by make-import-files, and Arrow formats floats differently (2020 vs. 2020.0)
+    df.to_csv(path_to_file, index=False)
+    try:
+        df.to_parquet(path_to_file.with_suffix('.parquet'), compression='zstd', index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        logger.warning(f'Unable to save a Parquet copy of {path_to_file} ({e}).')
+
+def load_data(path_to_file: str) -> DataFrame:
+    '''Loads Lyterati data for migration from either a CSV or a Parquet file saved by save_data. 
+    Object IDs are minted from these values, so data from Parquet is given the same dtypes it would have if read from the CSV: categoricals are decoded to strings, and integer columns with nulls become floats.'''
+    if not path_to_file.endswith('.parquet'):
+        return pd.read_csv(path_to_file)
+    table = pq.read_table(path_to_file)
+    table = table.cast(pa.schema([field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field 
+                                  for field in table.schema]))
+    # Ignore the pandas dtypes stored in the file, which would restore the Arrow-backed and categorical columns
+    return table.to_pandas(ignore_metadata=True)
+
 def save_reports(reports: DataFrame, path_to_save_reports: str, by_category: bool=True): 
     '''Saves the merged reports to the provided path. If by_category is True, reports will be divided by category, presumed to be the values of the given dictionary (and corresponding to the top-level categories in LYTERATI_TYPE_MAPPING).'''
     path_to_save_reports = Path(path_to_save_reports)
     ts = datetime.now().strftime('%Y-%m-%d')
     extract_non_matches(reports, path_to_save_reports)
     if by_category:
-        for category in reports.category.unique():
-            df = reports.loc[reports.category == category]
+        # Partition the reports in a single pass, rather than scanning the whole frame for each category
+        for category, df in reports.groupby('category', sort=False, observed=True):
             # Drop null columns
             df = df.dropna(axis=1, how='all')
             file = path_to_save_reports / f'lyterati_data_for_{category}_{ts}.csv'
             logger.info(f'Saving report to {file}')
-            df.to_csv(file, index=False)
+            save_data(df, file)
             generate_stats(df, path_to_save_reports, category)
     else:
         file = path_to_save_reports / f'lyterati_data_{ts}.csv'
         logger.info(f'Saving reports to {file}')
-        reports.to_csv(file, index=False)
+        save_data(reports, file)
         generate_stats(reports, path_to_save_reports)
 
 def generate_stats(reports: DataFrame, path_to_save_stats: str, category: str=None):
     '''Generates and saves to CSV basic info per school on non-matched users, unique users, and number of records per type.'''
-    grouped = reports.groupby('school_code')
-    def apply_stats(df):
-        df['unique_id'] = df.first_name + df.last_name + df.department_name
-        df['missing_users'] = len(df.unique_id.unique()) - len(df.gw_id.unique())
-        df['unique_users'] = len(df.unique_id.unique())
-        return df.groupby(['missing_users', 'unique_users', 'report_code']).college_name.count()
-    stats_df = grouped.apply(apply_stats).unstack()
+    name_fields = reports[['first_name', 'last_name', 'department_name']]
+    # Hash the names to an integer key, which is cheaper to count than concatenated strings. As with concatenation, a null in any part yields a null key.
+    unique_id = pd.util.hash_pandas_object(name_fields, index=False).astype('UInt64').mask(name_fields.isnull().any(axis=1))
+    # Only include observed values of categorical columns
+    grouped = reports.assign(unique_id=unique_id).groupby('school_code', observed=True)
+    # Null names/IDs are counted as a distinct value, as with Series.unique
+    unique_users = grouped.unique_id.nunique(dropna=False)
+    users = pd.DataFrame({'missing_users': unique_users - grouped.gw_id.nunique(dropna=False),
+                          'unique_users': unique_users})
+    # Number of records per report type, one column per type
+    counts = reports.groupby(['school_code', 'report_code'], observed=True).college_name.count().unstack()
+    stats_df = users.join(counts).set_index(['missing_users', 'unique_users'], append=True)
     path_to_save_stats = Path(path_to_save_stats)
     if category:
         filename = f'lyterati_data_{category}_stats.csv'
     else:
         filename = f'lyterati_data_stats.csv'
-    stats_df.to_csv(path_to_save_stats / filename)
+    write_csv(stats_df, path_to_save_stats / filename, index=True)
 
 def extract_non_matches(reports: DataFrame, path_to_save_file: str):
     '''Generates a CSV of those names and affiliations for which a match on profile data could not be found.'''
     profile_id_field, merge_fields = CONFIG['profile_id_field'], CONFIG['merge_fields']
-    missing_ids = reports.loc[reports[profile_id_field].isnull()][merge_fields].drop_duplicates()
+    # Select the rows and the merge columns in one step, rather than copying every column of the unmatched rows
+    missing_ids = reports.loc[reports[profile_id_field].isnull().to_numpy(), merge_fields].drop_duplicates()
     missing_ids.to_csv(Path(path_to_save_file) / 'missing_ids.csv', index=False)
 
-def load_mapping() -> dict[str, list[str]]:
-    '''Loads the JSON mapping from LYTERATI_TYPE_MAPPING, which specifies the category to which each Lyterati report type belongs. The mapping is presumed to reside in the same directory as the reports to be processed.'''
-    with open(CONFIG['lyterati_type_mapping']) as f:
-        mapping = json.load(f)
-        return { _type: category for category, list_of_types in mapping.items() 
-                for _type in list_of_types }
+@lru_cache(maxsize=None)
+def load_mapping(path_to_mapping: str) -> dict[str, str]:
+    '''Loads the JSON mapping from LYTERATI_TYPE_MAPPING, which specifies the category to which each Lyterati report type belongs, and inverts it to map each report type to its category. The result is cached for each path.'''
+    mapping = json.loads(Path(path_to_mapping).read_bytes())
+    return { _type: category for category, list_of_types in mapping.items() 
+            for _type in list_of_types }
 
 def update_ids(reports: DataFrame, path_to_id_map: str) -> DataFrame:
     '''Given a DataFrame representing Lyterati reports, and a path to an additional file (CSV or Excel) that contains missing ID's mapped to the MERGE_FIELDS columns in the reports DataFrame, add those ID's to the DataFrame.'''
     pid = CONFIG['profile_id_field']
     if path_to_id_map.endswith('csv'):
-        missing_ids = pd.read_csv(path_to_id_map)
+        missing_ids = pd.read_csv(path_to_id_map, engine='pyarrow', dtype_backend='pyarrow')
     else:
-        missing_ids = pd.read_excel(path_to_id_map)
+        missing_ids = pd.read_excel(path_to_id_map, engine=EXCEL_ENGINE, dtype_backend='pyarrow')
     # Identify the column that contains GWIDs
-    gwid_re = re.compile(r'G[0-9]{8}')
     for c in missing_ids.columns:
-        if missing_ids[c].str.match(gwid_re).all():
+        column = missing_ids[c]
+        # Cheap checks first, so the regex is only evaluated on likely candidates
+        if not pd.api.types.is_string_dtype(column):
+            continue
+        first = column.first_valid_index()
+        if first is None or not column[first].startswith('G') or not column.str.startswith('G').all():
+            continue
+        # On Arrow-backed strings, the match is evaluated by Arrow's regex kernel
+        if column.str.match(GWID_PATTERN).all():
             missing_ids = missing_ids.rename(columns={c: pid})
             break
     if pid not in missing_ids.columns:
         logger.error(f'File {path_to_id_map} should contain a column of GWIDs, but no such column was found. Please correct the file and run the script again.')
         return
-    matched = reports.merge(missing_ids, on=[c for c in missing_ids.columns if c != pid], how='left')
-    matched[f'{pid}_x'] = matched[f'{pid}_x'].fillna(matched[f'{pid}_y'])
-    matched = matched.rename(columns={f'{pid}_x': f'{pid}'}).drop(columns=f'{pid}_y')
+    # Look up the IDs for the missing rows by their other columns, rather than merging the frames and coalescing the two ID columns
+    key_cols = [c for c in missing_ids.columns if c != pid]
+    missing_ids = missing_ids.drop_duplicates(key_cols)
+    lookup = pd.Series(missing_ids[pid].to_numpy(), index=pd.MultiIndex.from_frame(missing_ids[key_cols]))
+    found = pd.Series(lookup.reindex(pd.MultiIndex.from_frame(reports[key_cols])).to_numpy(), index=reports.index)
+    matched = reports.assign(**{pid: reports[pid].fillna(found) if pid in reports.columns else found})
     num_missing = len(matched.loc[matched[pid].isnull()])
     if num_missing > 0:
         logger.warn(f'After merge, {num_missing} missing IDs remain.')
     return matched
 
-def process_for_elements(df: DataFrame, category: str) -> list[Union[list[dict[str, str]], DataFrame]]:
-    '''df should be the single DataFrame containing the merged Lyterati reports for import. Returns three lists of dicts: metadata, persons, and linking data, for constructing the import files, as well as the original DataFrame, with the list of object IDs appended as column.'''
+def make_mapper(category: SourceHeading, minter: Union[ElementsObjectID, DeferredObjectID]) -> ElementsMapping:
+    '''Creates the ElementsMapping for the given category from the settings in CONFIG.'''
     elements_category = category.category
-    concat_fields = CONFIG['concat_fields'][elements_category]
+    user_author_mapping = CONFIG['user_author_mapping'] if elements_category in CONFIG['user_author_mapping']['included_in'] else None
+    object_privacy = CONFIG.get('object_privacy', {}).get(elements_category)
+    doi_fields = CONFIG['doi_fields'] if elements_category == 'publication' else None
+    return ElementsMapping(path_to_mapping=CONFIG['mapping'][elements_category], 
+                           minter=minter,
+                           parser=AuthorParser(),
+                           user_id_field=CONFIG['profile_id_field'],
+                           path_to_choice_lists=CONFIG['choice_lists'].get(elements_category),
+                           concat_fields=CONFIG['concat_fields'][elements_category], 
+                           user_author_mapping=user_author_mapping,
+                           doi_fields=doi_fields,
+                           end_year_min=CONFIG['end_year_min'],
+                           object_privacy=object_privacy)
+
+def map_records(records: list[dict], category: SourceHeading) -> list[Optional[tuple[dict[str, str], dict[str, str], list[dict[str, str]]]]]:
+    '''Maps each record to its metadata, linking, and persons rows for Elements, or None if the record can't be mapped. Runs in a worker process, so the object ID in each row is a placeholder: the hash of the record, to be exchanged for the unique ID by the caller.'''
+    mapper = make_mapper(category, DeferredObjectID())
+    mapped = []
+    for record in records:
+        elements_row = mapper.make_mapped_row(record, map_type=category)
+        if not elements_row:
+            mapped.append(None)
+            continue
+        metadata = dict(elements_row)
+        # Temporary hack: skipping author parsing for publications
+        persons = list(elements_row.persons) if category.category != 'publication' else []
+        mapped.append((metadata, elements_row.link, persons))
+    return mapped
+
+def process_for_elements(df: DataFrame, category: SourceHeading) -> list[Union[list[dict[str, str]], DataFrame]]:
+    '''df should be the single DataFrame containing the merged Lyterati reports for import. Returns three lists of dicts: metadata, persons, and linking data, for constructing the import files, as well as the original DataFrame, with the list of object IDs appended as column.
+    Larger DataFrames are mapped in chunks in parallel; the object IDs are minted afterwards, in row order, so they are the same as when mapping the rows one after another.'''
     path = Path(CONFIG['object_id_store'])
     if not path.exists():
         path.touch()
@@ -168,57 +347,62 @@ def process_for_elements(df: DataFrame, category: str) -> list[Union[list[dict[s
         minter.path_to_id_store = path
     else:
         minter = ElementsObjectID(path)
-    parser = AuthorParser()
-    user_author_mapping = CONFIG['user_author_mapping'] if elements_category in CONFIG['user_author_mapping']['included_in'] else None
-    object_privacy = CONFIG.get('object_privacy', {}).get(elements_category)
-    doi_fields = CONFIG['doi_fields'] if elements_category == 'publication' else None
-    mapper = ElementsMapping(path_to_mapping=CONFIG['mapping'][elements_category], 
-                             minter=minter,
-                             parser=parser,
-                             user_id_field=CONFIG['profile_id_field'],
-                             path_to_choice_lists=CONFIG['choice_lists'].get(elements_category),
-                             concat_fields=concat_fields, 
-                             user_author_mapping=user_author_mapping,
-                             doi_fields=doi_fields,
-                             end_year_min=CONFIG['end_year_min'],
-                             object_privacy=object_privacy)
+    # Build each row from the column values directly, avoiding the namedtuple construction of itertuples
+    # Interned, like the field names in the mapping, so that the lookups by column name for each row can match on identity
+    columns = [sys.intern(c) for c in df.columns]
+    records = [dict(zip(columns, values)) for values in zip(*[df[c].tolist() for c in columns])]
+    if len(records) < PARALLEL_MIN_ROWS:
+        mapped = map_records(records, category)
+    else:
+        workers = os.cpu_count() or 1
+        chunk_size = -(-len(records) // workers)
+        chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            mapped = [row for chunk in executor.map(partial(map_records, category=category), chunks) for row in chunk]
 
     metadata_rows = []
     linking_rows = []
     persons_rows = []
     object_ids = []
-    for row in df.itertuples(index=False):
-        elements_row = mapper.make_mapped_row(row, map_type=category)
-        if not elements_row:
+    for row in mapped:
+        if not row:
             object_ids.append(None)
             continue
-        metadata_rows.append(dict(elements_row))
-        linking_rows.append(elements_row.link)
-        # Temporary hack: skipping author parsing for publications
-        if elements_category != 'publication':
-            persons_rows.extend(list(elements_row.persons))
-        object_ids.append(elements_row.id)
+        metadata, link, persons = row
+        # Exchange the placeholder hash for the object's unique ID
+        hash = metadata['id']
+        _id = minter.id_for_hash(hash)
+        metadata['id'] = _id
+        metadata_rows.append(metadata)
+        linking_rows.append({ k: _id if v == hash else v for k, v in link.items() })
+        for person in persons:
+            person['id'] = _id
+        persons_rows.extend(persons)
+        object_ids.append(_id)
     minter.persist_ids()
     df['elements_id'] = object_ids
     return metadata_rows, linking_rows, persons_rows, df
     
+def save_import_files(rows: list[list[dict[str, str]]], category: SourceHeading, output_dir: Path):
+    '''Saves the metadata, linking, and persons rows from process_for_elements to the files for import into Elements, skipping any with no rows. These are written with DataFrame.to_csv, so that the format of the files is the same whatever the data.'''
+    label = {'publication': 'publications', 'activity': 'activities', 'teaching-activity': 'teaching-activities'}.get(category.category)
+    for name, output in zip(['metadata', 'linking', 'persons'], rows):
+        if output:
+            pd.DataFrame.from_records(output).to_csv(output_dir / f'{label}-{name}.csv', index=False)
+
 @click.group()
 def cli():
     pass
 
 @cli.command()
-@click.option('--data-source', required=True) # Should be a single CSV containing the aggregated records for this category
+@click.option('--data-source', required=True) # Should be a single CSV (or its Parquet copy) containing the aggregated records for this category
 @click.option('--category', type=click.Choice(['service', 'research', 'teaching'], case_sensitive=False), default='service') # As present in Lyterati -- the config YAML file determines how these are mapped to Elements object categories
 def make_import_files(data_source, category):
-    data = pd.read_csv(data_source)
+    data = load_data(data_source)
     output_dir = Path(CONFIG['output_dir'])
     category = SourceHeading[category.upper()]
     processed = process_for_elements(data, category)
-    for name, output in zip(['metadata', 'linking', 'persons'], processed[:3]):
-        if output:
-            df = pd.DataFrame.from_records(output)
-            label = {'publication': 'publications', 'activity': 'activities', 'teaching-activity': 'teaching-activities'}.get(category.category)
-            df.to_csv(output_dir / f'{label}-{name}.csv', index=False)
+    save_import_files(processed[:3], category, output_dir)
     # Write original with object ID's for cross-reference
     data_source_path = Path(data_source).parents[0]
     file_name = Path(data_source).stem
@@ -227,12 +411,13 @@ def make_import_files(data_source, category):
 
 @cli.command()
 @click.option('--id-source', default='./data/to-migrate/missing_ids.csv') # File with ID's missing from the output of prep_lyterati_reports
-@click.option('--data-source', required=True) # Output of prep_lyterati_reports: should be a single CSV
+@click.option('--data-source', required=True) # Output of prep_lyterati_reports: should be a single CSV (or its Parquet copy)
 def add_missing_ids(id_source, data_source):
     '''Adds IDs from the id-source to the data-source, matching on columns defined in the constant MERGE_FIELDS. Result is saved to the original file specified by data-source.'''
-    reports = pd.read_csv(data_source)
+    reports = load_data(data_source)
     reports = update_ids(reports, id_source)
-    reports.to_csv(data_source, index=False)
+    # Keep the CSV and its Parquet copy in sync
+    save_data(reports, Path(data_source).with_suffix('.csv'))
 
 @cli.command()
 @click.option('--data-source', default='./data/lyterati-exports') # Should be a folder containing one or more CSV files, which will be aggregated and split according to the top-level categories in Lyterati (research, service, teaching)
@@ -241,7 +426,7 @@ def add_missing_ids(id_source, data_source):
 def prep_lyterati_reports(data_source, target, exclude):
     '''Values passed to --exclude/-e should correspond to the part of the filename designating either a school or a type of report. For instance, -e grants will exclude all files with "grants" or "Grants" in the title. Matching is case-insensitive.'''
     ids = load_ids_from_profiles()
-    reports = load_reports(data_source, exclude=exclude)
+    reports = load_reports(data_source, exclude=exclude, usecols=CONFIG.get('report_columns'))
     if reports.empty:
         logger.error('Unable to finish processing reports. Please fix the errors flagged in the log.')
         exit()    
@@ -1,12 +1,17 @@
 import requests
-import csv
 import pandas as pd
 import time
+import logging
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
 
 OPENALEX_API_URL = "https://api.openalex.org"
 INPUT_CSV = "input.csv"
 OUTPUT_CSV = "output.csv"
 SLEEP_TIME = 1
+BATCH_SIZE = 50
+MAX_RETRIES = 3
 
 df = pd.read_csv(INPUT_CSV)
 
@@ -16,57 +21,101 @@ df = pd.read_csv(INPUT_CSV)
 # and assigning a score based on name similarity
 
 # SLEEP_TIME is the time between API requests to OpenAlex
+# BATCH_SIZE is the number of DOIs looked up per request (OpenAlex allows up to 50 values in an OR filter)
+# MAX_RETRIES is the number of attempts for a request that is rate-limited (429) or fails with a server error (5xx), waiting twice as long before each retry
 
+OUTPUT_COLUMNS = [
+    "college_name",
+    "department_name",
+    "last_name",
+    "first_name",
+    "middle_name",
+    "research_heading",
+    "heading_type",
+    "contribution_year",
+    "title",
+    "authors",
+    "publication_name",
+    "additional_details",
+    "url",
+    "school_code",
+    "report_code",
+    "category",
+    "gw_id",
+    "doi",
+    "best_match_name_score",
+    "best_match_orcid",
+]
 
-def write_header_row():
-    with open(OUTPUT_CSV, "w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        header_row = [
-            "college_name",
-            "department_name",
-            "last_name",
-            "first_name",
-            "middle_name",
-            "research_heading",
-            "heading_type",
-            "contribution_year",
-            "title",
-            "authors",
-            "publication_name",
-            "additional_details",
-            "url",
-            "school_code",
-            "report_code",
-            "category",
-            "gw_id",
-            "doi",
-            "best_match_name_score",
-            "best_match_orcid",
-        ]
-        writer.writerow(header_row)
-
-
-def get_authors_from_open_alex_by_doi(doi):
-    time.sleep(SLEEP_TIME)
-    response = requests.get(f"{OPENALEX_API_URL}/works/doi:{doi}")
-    if response.status_code == 200:
-        data = response.json()
-        author_list = []
-        for authorship in data["authorships"]:
-            author_list.append(
-                {
-                    "orcid": authorship["author"]["orcid"],
-                    "display_name": authorship["author"]["display_name"],
-                }
-            )
-        return author_list
-    else:
+
+def normalize_doi(doi):
+    doi = str(doi).strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            return doi[len(prefix):]
+    return doi
+
+
+def get_with_retries(session, url, params=None):
+    """
+    Makes a GET request, retrying with exponential backoff if the request is rate-limited or fails with a server error. Returns the last response.
+    """
+    for attempt in range(MAX_RETRIES):
+        time.sleep(SLEEP_TIME * 2**attempt)
+        response = session.get(url, params=params)
+        if response.status_code != 429 and response.status_code < 500:
+            break
+        logger.warning(f"Request to {url} failed with status {response.status_code} (attempt {attempt + 1} of {MAX_RETRIES}).")
+    return response
+
+
+def authors_from_work(work):
+    return [
+        {
+            "orcid": authorship["author"]["orcid"],
+            "display_name": authorship["author"]["display_name"],
+        }
+        for authorship in work["authorships"]
+    ]
+
+
+def get_authors_from_open_alex_by_doi(session, doi):
+    """
+    Looks up a single DOI and returns its list of authors, or an empty list if it can't be retrieved.
+    """
+    response = get_with_retries(session, f"{OPENALEX_API_URL}/works/doi:{doi}")
+    if response.status_code != 200:
+        if response.status_code != 404:
+            logger.error(f"Unable to look up DOI {doi}: status {response.status_code}.")
         return []
+    return authors_from_work(response.json())
+
+
+def get_authors_from_open_alex_by_dois(session, dois):
+    """
+    Looks up a batch of DOIs with a single OR filter and returns a dict mapping each normalized DOI to its list of authors.
+    DOIs not found in OpenAlex are absent from the result. If the batch request fails, each DOI is looked up on its own, so that a failure affects as few DOIs as possible.
+    """
+    response = get_with_retries(
+        session,
+        f"{OPENALEX_API_URL}/works",
+        params={"filter": f"doi:{'|'.join(dois)}", "per-page": BATCH_SIZE},
+    )
+    if response.status_code != 200:
+        logger.error(f"Batch lookup of {len(dois)} DOIs failed with status {response.status_code}; looking them up one at a time.")
+        return {doi: authors for doi in dois if (authors := get_authors_from_open_alex_by_doi(session, doi))}
+    authors_by_doi = {}
+    for work in response.json()["results"]:
+        if not work.get("doi"):
+            continue
+        authors_by_doi[normalize_doi(work["doi"])] = authors_from_work(work)
+    return authors_by_doi
 
 
 def name_similarity_score(display_name, first_name, last_name, middle_name):
     score = 0
-    split_display_name = display_name.split(" ")
+    # A set, so that each check is a hash lookup rather than a scan of the name parts
+    split_display_name = set(display_name.split(" "))
     if last_name is not None and last_name in split_display_name:
         score += 50
     if first_name is not None and first_name in split_display_name:
@@ -76,44 +125,34 @@ def name_similarity_score(display_name, first_name, last_name, middle_name):
     return score
 
 
-write_header_row()
-
-with open(OUTPUT_CSV, "a", newline="") as file:
-    writer = csv.writer(file)
-    for index, row in df.iterrows():
-        authors_list = get_authors_from_open_alex_by_doi(row.doi)
-        if authors_list != []:
-            for author in authors_list:
-                author["name_score"] = name_similarity_score(
-                    author["display_name"],
-                    row.first_name,
-                    row.last_name,
-                    row.middle_name,
-                )
-            best_match = max(authors_list, key=lambda x: x["name_score"])
-        else:
-            best_match = {"name_score": 0, "orcid": "Not found"}
-
-        new_row = [
-            row.college_name,
-            row.department_name,
-            row.last_name,
-            row.first_name,
-            row.middle_name,
-            row.research_heading,
-            row.heading_type,
-            row.contribution_year,
-            row.title,
-            row.authors,
-            row.publication_name,
-            row.additional_details,
-            row.url,
-            row.school_code,
-            row.report_code,
-            row.category,
-            row.gw_id,
-            row.doi,
-            best_match["name_score"],
-            best_match["orcid"],
-        ]
-        writer.writerow(new_row)
+dois = df.doi.dropna().map(normalize_doi).unique().tolist()
+authors_by_doi = {}
+with requests.Session() as session:
+    for i in range(0, len(dois), BATCH_SIZE):
+        authors_by_doi.update(
+            get_authors_from_open_alex_by_dois(session, dois[i : i + BATCH_SIZE])
+        )
+
+rows = []
+for row in df.itertuples(index=False):
+    authors_list = (
+        authors_by_doi.get(normalize_doi(row.doi), []) if pd.notnull(row.doi) else []
+    )
+    if authors_list != []:
+        for author in authors_list:
+            author["name_score"] = name_similarity_score(
+                author["display_name"],
+                row.first_name,
+                row.last_name,
+                row.middle_name,
+            )
+        best_match = max(authors_list, key=lambda x: x["name_score"])
+    else:
+        best_match = {"name_score": 0, "orcid": "Not found"}
+
+    rows.append(
+        [getattr(row, c) for c in OUTPUT_COLUMNS[:-2]]
+        + [best_match["name_score"], best_match["orcid"]]
+    )
+
+pd.DataFrame(rows, columns=OUTPUT_COLUMNS).to_csv(OUTPUT_CSV, index=False)
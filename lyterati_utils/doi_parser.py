@@ -3,6 +3,7 @@ import openpyxl
 import string
 import urllib
 from typing import Optional
+from functools import lru_cache
 import pandas as pd
 
 # CrossRef's recommended regular expression
@@ -16,7 +17,12 @@ PMID_URL = re.compile(r'https?://(?:pubmed|www)\.ncbi\.nlm\.nih\.gov/(?:(?:pmc/a
 # PMC URL
 PMC_URL = re.compile(r'https?://www\.ncbi\.nlm\.nih\.gov/pmc/articles/(PMC\d+)/?$')
 # ISBN: from  O'Reilly Regular Expressions Cookbook, 2nd edition
-ISBN_RE = re.compile(r'(?:ISBN(?:-13)?:?\ )?(?=[0-9]{13}|(?=(?:[0-9]+[-\ ]){4})[-\ 0-9]{17})(97[89][-\ ]?[0-9]{1,5}[-\ ]?[0-9]+[-\ ]?[0-9]+[-\ ]?[0-9])') 
+# The digit runs in the lookahead are matched atomically, since a run can only be followed by a separator once it has consumed every digit; this stops the engine from backtracking through long runs of digits
+# (A lookahead and a backreference, (?=([0-9]+))\1, stand in for the possessive [0-9]++, which needs Python 3.11. The ISBN itself is therefore group 2.)
+ISBN_RE = re.compile(r'(?:ISBN(?:-13)?:?\ )?(?=[0-9]{13}|(?=(?:(?=([0-9]+))\1[-\ ]){4})[-\ 0-9]{17})(97[89][-\ ]?[0-9]{1,5}[-\ ]?[0-9]+[-\ ]?[0-9]+[-\ ]?[0-9])') 
+
+# Upper bound on the number of distinct strings memoized by the Parser methods
+CACHE_SIZE = 100_000
 
 class Parser:
 
@@ -30,8 +36,9 @@ class Parser:
         return txt
 
     @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
     def extract_doi(txt: str, is_url: bool=False) -> Optional[str]:
-        '''Extracts text matching the CrossRef DOI pattern from a larger string. Attempts to catch certain edge cases.'''
+        '''Extracts text matching the CrossRef DOI pattern from a larger string. Attempts to catch certain edge cases. Results are cached, since the same URLs and citations recur across rows.'''
         txt = Parser.clean_xl_text(txt, is_url)
         if match := CROSSREF_RE.search(txt):
             doi = match.group(1)
@@ -52,7 +59,7 @@ class Parser:
         '''Extracts ISBN's from a larger string. Takes the first ISBN when multiple ISBN's are present.'''
         txt = Parser.clean_xl_text(txt, is_url)
         if match := ISBN_RE.search(txt):
-            isbn = match.group(1)
+            isbn = match.group(2)
             return isbn
 
     @staticmethod   
@@ -1,16 +1,22 @@
 from __future__ import annotations
 from datetime import date, datetime
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from hashlib import sha256
 from .name_parser import AuthorParser, Author
 from typing import Optional, NamedTuple, Iterator
 from collections import defaultdict
 import re
-from functools import partial
+from functools import partial, lru_cache
 from enum import Enum
 from .doi_parser import Parser
 import warnings
 import unicodedata
+import sys
+import os
+import csv
+from pathlib import Path
 
 
 class TermDates(Enum):
@@ -22,6 +28,9 @@ class TermDates(Enum):
     SUMMER_START = (6, 1)
     SUMMER_END = (8, 31)
 
+# Month and day for each term, keyed by term name (as it appears in the source) and whether it's the start date
+TERM_DATES = { (t.name.split('_')[0].title(), t.name.endswith('_START')): t.value for t in TermDates }
+
 ID_LENGTH = 8
 
 class SourceHeading(Enum):
@@ -33,24 +42,21 @@ class SourceHeading(Enum):
     @property
     def include_user(self):
         '''Determines whether the user should be included in relevant person lists'''
-        match self:
-            case SourceHeading.SERVICE:
-                return False
-            case SourceHeading.RESEARCH:
-                return True
-            case SourceHeading.TEACHING:
-                return False
+        return _INCLUDE_USER[self]
     
     @property
     def category(self):
-        match self:
-            case SourceHeading.SERVICE:
-                return 'activity'
-            case SourceHeading.RESEARCH:
-                return 'publication'
-            case SourceHeading.TEACHING:
-                return 'teaching-activity'
-    
+        # Looked up on every row, so use a dict for these fixed values
+        return _CATEGORIES[self]
+
+_INCLUDE_USER = { SourceHeading.SERVICE: False,
+                  SourceHeading.RESEARCH: True,
+                  SourceHeading.TEACHING: False }
+
+_CATEGORIES = { SourceHeading.SERVICE: 'activity',
+                SourceHeading.RESEARCH: 'publication',
+                SourceHeading.TEACHING: 'teaching-activity' }
+
 
 class LinkType(Enum):
     '''Defines the Elements user link types for each category'''
@@ -75,41 +81,164 @@ class LinkType(Enum):
 
 LINK_HEADERS = ['category-1', 'id-1', 'category-2', 'id-2', 'link-type-id', 'visible']
 
+# User link type for each object category, looked up once here rather than for every row
+LINK_TYPE_IDS = { category: LinkType.from_object(category).value for category in ('activity', 'teaching-activity', 'publication') }
+
 PRIVACY_HEADERS = ['privacy', 'lock-privacy']
 
-def normalize(column_str: str) -> str:
-    '''Normalizes column names to lower-case, underscore-separated'''
-    return column_str.strip().lower().replace(' ', '_')
+# Number of distinct strings for which cleaned values are cached
+CLEAN_CACHE_SIZE = 100_000
+
+@lru_cache(maxsize=CLEAN_CACHE_SIZE)
+def clean_text(value: str) -> str:
+    '''Fixes bad strings from the source data, including form-feed characters. The same values recur across many rows (names of schools, departments, etc.), so the results are cached.'''
+    value = Parser.clean_xl_text(value, False)
+    # Normalization leaves ASCII strings unchanged, so skip it (and the replacement of the decomposed character below) for those
+    if value.isascii():
+        return value.replace('\x0b', ' ')
+    value = unicodedata.normalize('NFKD', value).replace('\x0b', ' ')
+    return value.replace('Â', '')
+
+# Number of distinct date strings for which parsed values are cached
+DATE_CACHE_SIZE = 10_000
+
+YEAR_RE = re.compile(r'((?:19|20)\d{2})(\.0)?')
+TERM_RE = re.compile(r'(Spring|Fall|Summer) ((?:19|20)\d{2})')
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(date_str: str) -> tuple[Optional[int], Optional[str]]:
+    '''Returns the year and, if the string names a term ("Fall 2019"), the term, or (None, None) if neither is recognized. Cached, since a small number of years and terms recur across the source data.'''
+    # Dates are most often just a year: check for that directly before trying the patterns (equivalent to matching YEAR_RE)
+    prefix = date_str[:4]
+    if len(prefix) == 4 and prefix[:2] in ('19', '20') and prefix[2:].isdecimal():
+        return int(prefix), None
+    if m := YEAR_RE.match(date_str):
+        return int(m.group(1)), None
+    if m := TERM_RE.match(date_str):
+        return int(m.group(2)), m.group(1)
+    return None, None
+
+def is_empty(value) -> bool:
+    '''Equivalent to pd.isna(value) or not value for a single value, without a call into pandas: None and pd.NA are singletons, and NaN and NaT are the only values not equal to themselves. (pd.NA is checked before its truth value is needed, since that is undefined.)'''
+    return value is None or value is pd.NA or value != value or not value
 
 class ElementsObjectID:
     '''Class to create unique IDs for objects.'''
 
     def __init__(self, path_to_id_store: str=None):
-        '''Optionally, supply the path to CSV storing hashes and unique ID's. The ID's are assumed to be truncated prefixes of the hashes.'''
+        '''Optionally, supply the path to CSV (or Parquet, if the path ends in .parquet) storing hashes and unique ID's. The ID's are assumed to be truncated prefixes of the hashes.'''
         if path_to_id_store:
-            self.used = dict(pd.read_csv(path_to_id_store, header=None).values)
+            if str(path_to_id_store).endswith('.parquet'):
+                table = pq.read_table(path_to_id_store)
+                self.used = dict(zip(table['hash'].to_pylist(), table['id'].to_pylist()))
+            else:
+                # Read as plain strings: pandas would infer a numeric type when every ID happens to be all digits, dropping any leading zeros
+                with open(path_to_id_store, newline='') as f:
+                    self.used = dict(csv.reader(f))
             self.path_to_id_store = path_to_id_store
         else:
             self.used = {}
+        # The ID's already issued, for checking collisions without scanning every value in self.used
+        self.ids = set(self.used.values())
 
     def mint_id(self, values: list[str]) -> str:
         '''Returns the first six characters of a hex digest for a SHA256 hash of the supplied list of values. Only non-null values will be used in creating the hash. If a list of ids was provided in creating the instance, ensures that the minted id is unique.'''
-        input = ''.join([str(v) for v in values if (not pd.isna(v)) and v]).encode()
-        hash = sha256(input).hexdigest()
+        return self.id_for_hash(ElementsObjectID.hash_values(values))
+
+    @staticmethod
+    def hash_values(values: list[str]) -> str:
+        '''Returns the hex digest for a SHA256 hash of the non-null values in the supplied list.'''
+        input = ''.join([str(v) for v in values if not is_empty(v)]).encode()
+        return sha256(input, usedforsecurity=False).hexdigest()
+
+    def id_for_hash(self, hash: str) -> str:
+        '''Returns the ID for a hash created by hash_values, minting a new one if the hash hasn't been seen before.'''
         # If this hash is already in the store, return the ID
         if hash in self.used:
             return self.used[hash]
         # Otherwise, mint a new ID
         _id = hash[:ID_LENGTH]
         # Check for collisions on the prefix and increment until it no longer matches
-        while (_id in self.used.values()):
+        while (_id in self.ids):
             _id = hex(int(_id, 16) + 1)[:ID_LENGTH]
         self.used[hash] = _id
+        self.ids.add(_id)
         return _id
 
     def persist_ids(self):
-        '''Assumes a path was provided when creating the instance.'''
-        pd.Series(self.used).to_csv(self.path_to_id_store, header=False)
+        '''Assumes a path was provided when creating the instance. The store is written to a temporary file first and then moved into place, so that an interrupted write doesn't leave a truncated store behind.'''
+        path = Path(self.path_to_id_store)
+        tmp_path = path.with_name(path.name + '.tmp')
+        if path.suffix == '.parquet':
+            table = pa.table({'hash': list(self.used.keys()), 'id': list(self.used.values())})
+            pq.write_table(table, tmp_path, compression='zstd')
+        else:
+            with open(tmp_path, 'w', newline='') as f:
+                csv.writer(f, lineterminator='\n').writerows(self.used.items())
+        os.replace(tmp_path, path)
+
+
+class DeferredObjectID:
+    '''Stands in for ElementsObjectID when rows are mapped in separate processes. The "ID" minted for each row is the full hash of its values, which can be exchanged for a unique ID with ElementsObjectID.id_for_hash once the rows have been collected, in their original order.'''
+    
+    def mint_id(self, values: list[str]) -> str:
+        return ElementsObjectID.hash_values(values)
+
+
+# Number of mapping files and choice-list workbooks for which the loaded contents are cached
+MAPPING_CACHE_SIZE = 8
+
+@lru_cache(maxsize=MAPPING_CACHE_SIZE)
+def load_mapping_sheet(path_to_mapping: str) -> tuple[dict[str, str], dict[str, str], dict[str, defaultdict[str, list[str]]]]:
+    '''Loads a column mapping from the CSV file at path_to_mapping, returning the map of source types to Elements object types, the map of Elements fields to their data types, and the map of the source fields for each source type to Elements fields. The result is cached for each path, so it should not be modified: ElementsMapping makes its own copies.'''
+    # The sheet itself is only needed to build the maps below
+    mapping = pd.read_csv(path_to_mapping)
+    # Use the second row as the column heading
+    mapping.columns = mapping.iloc[0].values
+    # Expects that the mapping starts in the 4th column, with each pair of columns representing a mapping from Elements fields to fields in the source system
+    # Maps each Elements object type to the type in the source system
+    object_type_map = {b: a for a,b in zip(mapping.columns[3::2], mapping.columns[4::2]) if not pd.isna(b)}
+    # Mapping to derive the data type for each underlying field 
+    field_type_map = dict([ (sys.intern(k.strip('"')), v) for k,v in mapping.iloc[2:, 0:2].values 
+                       if not pd.isna(k) and k ])
+    # For each record type in the source system, maps the associated fields to the underlying fields in Elements
+    column_map = {}
+    el_keys = mapping.iloc[2:, 0].str.strip('"')
+    for key, _ in object_type_map.items():
+        column_map[key] = defaultdict(list)
+        source_keys = mapping[key].iloc[2:]
+        # Normalize the source field names for this type to lower-case, underscore-separated, in one pass, skipping the blanks
+        mapped = source_keys.notnull() & (source_keys != '')
+        source_keys = source_keys[mapped].str.strip().str.lower().str.replace(' ', '_', regex=False)
+        for el_key, source_key in zip(el_keys[mapped], source_keys):
+            # The same source system field may map to more than one Elements field. To account for this, we add Elements fields as a list associated with each source system field. (For a many:1 relation between system fields and an Elements field, we use the concat_fields parameter.)
+            # Field names are interned, since they are used as keys for every row: lookups with the (also interned) column names of the source data can then match on identity
+            column_map[key][sys.intern(source_key)].append(sys.intern(el_key))
+    return object_type_map, field_type_map, column_map
+
+@lru_cache(maxsize=MAPPING_CACHE_SIZE)
+def load_choice_lists(path_to_choice_lists: str) -> dict[str, dict[str, str]]:
+    '''Expects an Excel file, where each sheet corresponds to an Elements choice field. The sheet name is expected to correspond to the name of the Elements (underlying) choice field.
+    If the sheet has only one column, the column header is ignored, and the values to be tbe same in the source system and in Elements. If two columns, one is expected to have the header "Source System" and to contain values in the source field to be mapped to the choice values in the Elements field. '''
+    sheets = pd.read_excel(path_to_choice_lists, engine='openpyxl', sheet_name=None)
+    choice_map = {}
+    for name, sheet in sheets.items():
+        # Case 1: one column, list to constrain Elements field name
+        # Assume header == "Elements"
+        # Maps each possible value to itself
+        if len(sheet.columns) == 1:
+            sheet_dict = sheet.to_dict()
+            choice_map[name] = { v: v for v in sheet_dict['Elements'].values() }
+        # Case 2: two columns, assume one named "Elements", the other, "Source System"
+        # Assume each value in the source column is present only once (though values in the Elements column map repeat)
+        # Create a mapping from each Source System column value to the Elements value
+        else:
+            # Drop nulls -- where a value isn't mapped
+            sheet_dict = sheet.dropna().to_dict()
+            # Assume one columne is named "Elements" and there is only one other column
+            other_key = [k for k in sheet_dict.keys() if k != 'Elements'][0]
+            choice_map[name] = dict(zip(*[sheet_dict[other_key].values(), sheet_dict['Elements'].values()]))
+    return choice_map
 
 
 class ElementsMapping:
@@ -131,54 +260,34 @@ class ElementsMapping:
         self.parser = parser
         self.user_id_field = user_id_field
         self.choice_map = self.build_choice_map(path_to_choice_lists) if path_to_choice_lists else {}
-        self.mapping = pd.read_csv(path_to_mapping)
-        # Use the second row as the column heading
-        self.mapping.columns = self.mapping.iloc[0].values
-        # Expects that the mapping starts in the 4th column, with each pair of columns representing a mapping from Elements fields to fields in the source system
-        # Maps each Elements object type to the type in the source system
-        self.object_type_map = {b: a for a,b in zip(self.mapping.columns[3::2], self.mapping.columns[4::2]) if not pd.isna(b)}
-        # Mapping to derive the data type for each underlying field 
-        self.field_type_map = dict([ (k.strip('"'), v) for k,v in self.mapping.iloc[2:, 0:2].values 
-                           if not pd.isna(k) and k ])
-        # For each record type in the source system, maps the associated fields to the underlying fields in Elements
-        self.column_map = {}
-        for key, _ in self.object_type_map.items():
-            self.column_map[key] = defaultdict(list)
-            for el_key, source_key in self.mapping[[self.mapping.columns[0], key]].values[2:]:
-                # The same source system field may map to more than one Elements field. To account for this, we add Elements fields as a list associated with each source system field. (For a many:1 relation between system fields and an Elements field, we use the concat_fields parameter.)
-                if not pd.isna(source_key) and source_key:
-                    source_key = normalize(source_key)
-                    self.column_map[key][source_key].append(el_key.strip('"'))
+        object_type_map, field_type_map, column_map = load_mapping_sheet(path_to_mapping)
+        # The loaded maps are shared by every mapping from the same file, so each instance gets its own copies
+        self.object_type_map = dict(object_type_map)
+        self.field_type_map = dict(field_type_map)
+        self.column_map = { key: defaultdict(list, { source_key: list(el_keys) for source_key, el_keys in fields.items() }) 
+                           for key, fields in column_map.items() }
         # Fields to concatenate in the source system for matching to a single Elements field
         self.concat_fields = { from_field: to_field for to_field, v in concat_fields.items() 
                                     for from_field in v } if concat_fields else None
+        # The label each concatenated value is prefixed with, derived from the field name
+        self.concat_labels = { from_field: f'(Legacy) {from_field.replace("_", " ").title()}: ' for from_field in self.concat_fields } if concat_fields else None
         self.doi_fields = doi_fields
         self.end_year_min = end_year_min
         self.user_author_mapping = user_author_mapping
         self.object_privacy = object_privacy
+        # Settings that are the same for every row, parsed once here rather than in make_mapped_row
+        self._end_year_min = int(end_year_min) if end_year_min else None
+        if object_privacy is not None:
+            # Comma-delimited tuple (from the config file), second value should be a Boolean
+            privacy_settings = object_privacy.split(',')
+            privacy_settings[1] = privacy_settings[1].upper()
+            self._privacy_settings = privacy_settings
+        # Field mappings derived for each source type, populated as each type is first encountered
+        self._type_fields = {}
             
     def build_choice_map(self, path_to_choice_lists: str) -> dict[str, dict[str, str]]:
-        '''Expects an Excel file, where each sheet corresponds to an Elements choice field. The sheet name is expected to correspond to the name of the Elements (underlying) choice field.
-        If the sheet has only one column, the column header is ignored, and the values to be tbe same in the source system and in Elements. If two columns, one is expected to have the header "Source System" and to contain values in the source field to be mapped to the choice values in the Elements field. '''
-        sheets = pd.read_excel(path_to_choice_lists, engine='openpyxl', sheet_name=None)
-        choice_map = {}
-        for name, sheet in sheets.items():
-            # Case 1: one column, list to constrain Elements field name
-            # Assume header == "Elements"
-            # Maps each possible value to itself
-            if len(sheet.columns) == 1:
-                sheet_dict = sheet.to_dict()
-                choice_map[name] = { v: v for v in sheet_dict['Elements'].values() }
-            # Case 2: two columns, assume one named "Elements", the other, "Source System"
-            # Assume each value in the source column is present only once (though values in the Elements column map repeat)
-            # Create a mapping from each Source System column value to the Elements value
-            else:
-                # Drop nulls -- where a value isn't mapped
-                sheet_dict = sheet.dropna().to_dict()
-                # Assume one columne is named "Elements" and there is only one other column
-                other_key = [k for k in sheet_dict.keys() if k != 'Elements'][0]
-                choice_map[name] = dict(zip(*[sheet_dict[other_key].values(), sheet_dict['Elements'].values()]))
-        return choice_map
+        '''Returns a copy of the choice lists loaded (and cached) by load_choice_lists.'''
+        return { name: dict(choices) for name, choices in load_choice_lists(path_to_choice_lists).items() }
     
     @staticmethod
     def choice_validator(value: str, choices: dict[str, str]):
@@ -189,6 +298,35 @@ class ElementsMapping:
             warnings.warn(f'Value {value} not in choice list {list(choices.keys())}. Skipping this value because it won\'t map to the underlying choice field.')
 
     
+    def fields_for_type(self, source_type: str) -> tuple[dict[str, tuple], dict[str, str], list[str], dict[str, partial]]:
+        '''Returns the plan for mapping each source field, the mapping from Elements fields to source fields, the Elements person fields, and the choice field validators for the given source type. These are the same for every row of a type, so they are computed once per type and cached.'''
+        if source_type not in self._type_fields:
+            fields_from_source = self.column_map[source_type]
+            # This provides the name of the Elements fields for each column in the source, inverting the column mapping
+            elements_fields = { el_field: source_key for source_key, v in fields_from_source.items() 
+                                for el_field in v }
+            # Person fields are handled separately
+            person_fields = [ k for k in elements_fields if self.field_type_map[k] in ['person', 'person-list'] ]
+            validators = { k: partial(ElementsMapping.choice_validator, choices=self.choice_map[k]) 
+                          for k in elements_fields if k in self.choice_map }
+            # For each source field, the Elements fields it maps to, whether each keeps null values, and how each is to be handled, in the order of precedence used by ElementsMetadataRow.__iter__
+            field_plan = {}
+            for source_key, el_fields in fields_from_source.items():
+                plan = []
+                for el_field in el_fields:
+                    if el_field in person_fields:
+                        handling = ('person', None)
+                    elif el_field in ElementsMetadataRow.properties:
+                        handling = ('property', el_field.replace('-', '_'))
+                    elif el_field in validators:
+                        handling = ('choice', validators[el_field])
+                    else:
+                        handling = ('value', None)
+                    plan.append((el_field, el_field in ElementsMetadataRow.non_null_fields, *handling))
+                field_plan[source_key] = tuple(plan)
+            self._type_fields[source_type] = field_plan, elements_fields, person_fields, validators
+        return self._type_fields[source_type]
+    
     def make_mapped_row(self, row: dict[str, str] | NamedTuple, map_type: SourceHeading) -> ElementsMetadataRow:
         '''Input is a dict with the keys (or namedtuple with attributes) corresponding to column names in the source system, and values corresponding to a row of data. Outputs an instance of ElementsMetadataRow for mapping that data to Elements fields.'''
          # source_type is the input that determines the Element object type
@@ -211,45 +349,49 @@ class ElementsMapping:
         mapped_row.type = self.object_type_map[source_type]
         mapped_row.id = self.minter.mint_id(row.values())
         mapped_row.concat_fields = self.concat_fields
+        mapped_row.concat_labels = self.concat_labels
         # This is the column mapping that determines the applicable Elements columns for this particular type of object
-        mapped_row.fields_from_source = self.column_map[source_type] 
-        # This provides the name of the Elements fields for each column in the source, inverting the previous dict
-        mapped_row.elements_fields = { el_field: source_key for source_key, v in mapped_row.fields_from_source.items() 
-                                        for el_field in v}
+        field_plan, elements_fields, person_fields, validators = self.fields_for_type(source_type)
+        mapped_row.field_plan = field_plan
+        # This provides the name of the Elements fields for each column in the source
+        mapped_row.elements_fields = elements_fields
         # Person fields are handled separately
-        mapped_row.person_fields = [ k for k in mapped_row.elements_fields if self.field_type_map[k] in ['person', 'person-list'] ]
+        mapped_row.person_fields = person_fields
         # Whether to include the user in the person data
         if self.user_author_mapping:
             mapped_row.user_author_mapping = self.user_author_mapping
-        mapped_row.end_year_min = int(self.end_year_min) if self.end_year_min else None
+        mapped_row.end_year_min = self._end_year_min
         # Whether to map DOI's
         if self.doi_fields:
             mapped_row.doi_fields = self.doi_fields
         # Whether to make objects (in)visibile
         if self.object_privacy is not None:
-            # Comma-delimited tuple (from the config file), second value should be a Boolean
-            privacy_settings = self.object_privacy.split(',')
-            privacy_settings[1] = privacy_settings[1].upper()
-            mapped_row.privacy_settings = privacy_settings
+            mapped_row.privacy_settings = self._privacy_settings
         # Add validator for choice fields
-        for k in mapped_row.elements_fields:
-            if k in self.choice_map:
-                setattr(mapped_row, f'{k}_validator', partial(ElementsMapping.choice_validator, choices=self.choice_map[k]))
+        mapped_row.validators = validators
         return mapped_row
 
 class ElementsMetadataRow:
     '''Represents a single row for import data for Elements'''
+    # One instance is created per row, so use slots rather than a per-instance __dict__
+    __slots__ = ('data', 'id', 'category', 'type', 'user_id_field', 'parser', 'concat_fields', 'concat_labels', 'field_plan', 'elements_fields', 'person_fields', 
+                 'user_author_mapping', 'end_year_min', 'doi_fields', 'privacy_settings', 'visibility_setting', 'validators', '_persons')
     # Fields for which we want @property access, because we want to apply some formatting or type constraints
     # Note that these field names use hyphens, not underscores, to match the Elements fields
     properties = ['doi', 'start-date', 'end-date', 'department', 'institution', 'isbn-13', 'publication-date', 'external-identifiers', 'supervisory-role']
     non_null_fields = ['supervisory-role', 'end-date']
 
-    is_year = re.compile(r'((?:19|20)\d{2})(\.0)?')
-    is_term = re.compile(r'(Spring|Fall|Summer) ((?:19|20)\d{2})')
-
     def __init__(self, row: dict[str, str]):
         '''Used to create a row for the metadata import out of a row of Lyterati data. If the namedtuple comes from a pandas DataFrame, the Index column will be discarded. The instance of ElementsMapping provides the column mapping from Lyterati. The row parameter accepts a dict or namedtuple. The instance of ElementsObjectID is used to create unique ID's for each object.'''
         self.data = row
+        # Optional settings, assigned by ElementsMapping where they apply
+        self.user_author_mapping = None
+        self.privacy_settings = None
+        self.visibility_setting = None
+        # Validators for choice fields, keyed by Elements field
+        self.validators = {}
+        # Populated by __iter__
+        self._persons = None
 
     def _concatenate_fields(self):
         '''Updates data to concatenate fields before returning mapped fields.'''
@@ -257,13 +399,13 @@ class ElementsMetadataRow:
             for k, v in self.concat_fields.items():
                 concat_value = self.data.get(k)
                 # Only concat if something to add
-                if not pd.isna(concat_value) and concat_value:
-                    key_string = k.replace('_', ' ').title()
+                if not is_empty(concat_value):
+                    label = self.concat_labels[k]
                     # Check for empty fields
-                    if pd.isna(self.data[v]) or not self.data[v]:
-                        self.data[v] = f'(Legacy) {key_string}: {concat_value}'
+                    if is_empty(self.data[v]):
+                        self.data[v] = f'{label}{concat_value}'
                     else:
-                        self.data[v] += f'\n\n(Legacy) {key_string}: {concat_value}'
+                        self.data[v] += f'\n\n{label}{concat_value}'
 
     def __iter__(self) -> Iterator[str, str]:
         # Re-initialize _persons before every iteration, or else we'll create duplicates
@@ -276,29 +418,31 @@ class ElementsMetadataRow:
         self._concatenate_fields()
         # Other fields from the source system
         for key, value in self.data.items():
-            if isinstance(value, str):
-                # Fix bad strings, including form-feed characters
-                value = Parser.clean_xl_text(value, False).encode('utf8').decode()
-                value = unicodedata.normalize('NFKD', value).replace('\x0b', ' ')
-                value = value.replace('Â', '')
             # Map field name to Elements
             # There may be more than one Elements field to be derived
-            for e_key in self.fields_from_source.get(key, []):
+            plan = self.field_plan.get(key)
+            # Skip unmapped fields before doing any work on their values
+            if not plan:
+                continue
+            if isinstance(value, str):
+                value = clean_text(value)
+            is_null = is_empty(value)
+            for e_key, keep_null, handling, handler in plan:
                 # Skip NaN's, unless a non-nullable field (in which case all instances must have some value or a default value)
-                if (pd.isna(value) or (not value)) and (e_key not in self.non_null_fields):
+                if is_null and not keep_null:
                     continue
                 # Person field: extract separately
-                if e_key in self.person_fields:
+                if handling == 'person':
                     self._persons[e_key] = value
                 # If property descriptor exists, use it
-                elif e_key in self.properties:
-                    yield e_key, getattr(self, e_key.replace('-', '_'))
+                elif handling == 'property':
+                    yield e_key, getattr(self, handler)
                 # If validator exists, use it
-                elif hasattr(self, f'{e_key}_validator'):
-                    yield e_key, getattr(self, f'{e_key}_validator')(value)
+                elif handling == 'choice':
+                    yield e_key, handler(value)
                 else:
                     yield e_key, value
-        if hasattr(self, 'privacy_settings'):
+        if self.privacy_settings is not None:
             for key, value in zip(PRIVACY_HEADERS, self.privacy_settings):
                 yield key, value
 
@@ -306,9 +450,9 @@ class ElementsMetadataRow:
     def persons(self) -> Iterator[dict[str, str]]:
         # Can't call persons unless __iter__ has been called already
         # In this case, we return None
-        if not hasattr(self, '_persons'):
+        if self._persons is None:
             raise Exception(f'Cannot access the persons attribute of {self} before invoking its __iter__ method.')
-        if hasattr(self, 'user_author_mapping'):
+        if self.user_author_mapping:
             # Add the current user's names if needed to the list of persons
             user = { k: self.data[k] for k in self.user_author_mapping['fields'] if not pd.isna(self.data[k]) }
             persons = ElementsPersonList(self._persons, self.parser, user)
@@ -321,36 +465,38 @@ class ElementsMetadataRow:
     
     @property
     def link(self):
-        link_type_id = LinkType.from_object(self.category, None).value
-        if hasattr(self, 'visibility_setting'):
-            # Expect Boolean
-            visibility_setting = [str(self.visibility_setting).upper()]
-        else:
-            visibility_setting = []
+        link_type_id = LINK_TYPE_IDS[self.category]
+        user_id = self.data[self.user_id_field]
+        # Teaching activities are linked from the user to the object, the other categories from the object to the user
         if self.category == 'teaching-activity':
-            return dict(zip(LINK_HEADERS, [ 'user', self.data[self.user_id_field], self.category, self.id, link_type_id] +  visibility_setting))
-        return dict(zip(LINK_HEADERS, [self.category, self.id, 'user', self.data[self.user_id_field], link_type_id] + visibility_setting))
+            link = {'category-1': 'user', 'id-1': user_id, 'category-2': self.category, 'id-2': self.id, 'link-type-id': link_type_id}
+        else:
+            link = {'category-1': self.category, 'id-1': self.id, 'category-2': 'user', 'id-2': user_id, 'link-type-id': link_type_id}
+        if self.visibility_setting is not None:
+            # Expect Boolean
+            link['visible'] = str(self.visibility_setting).upper()
+        return link
         
     
     def convert_date(self, date_str: str, start_date: bool=True, year_end: bool=False) -> str:
-        if m := ElementsMetadataRow.is_year.match(str(date_str)):
-            year = int(m.group(1))
+        # Years may be read from the source as numbers
+        if not isinstance(date_str, str):
+            date_str = str(date_str)
+        year, term = parse_date(date_str)
+        if year is None:
+            warnings.warn(f'Unable to covert date string {date_str}. Skipping it.') 
+            return
+        if term is None:
             if start_date:
-                return date(year, 1, 1).strftime('%Y-%m-%d')
+                return date(year, 1, 1).isoformat()
             elif self.end_year_min and (year < self.end_year_min):
-                return date(year, 12, 31).strftime('%Y-%m-%d')
+                return date(year, 12, 31).isoformat()
             else:
                 # None for end_date when it would be the current year
                 return None 
-        elif m := ElementsMetadataRow.is_term.match(date_str):
-            year = int(m.group(2))
-            term_suffix = '_START' if start_date else '_END'
-            if year_end and year < datetime.now().year:
-                return date(year, 12, 31).strftime('%Y-%m-%d')
-            return date(year, *TermDates[m.group(1).upper() + term_suffix].value).strftime('%Y-%m-%d')
-        else:
-            warnings.warn(f'Unable to covert date string {date_str}. Skipping it.') 
-            return
+        if year_end and year < datetime.now().year:
+            return date(year, 12, 31).isoformat()
+        return date(year, *TERM_DATES[(term, start_date)]).isoformat()
 
     @property
     def doi(self):
@@ -382,9 +528,9 @@ class ElementsMetadataRow:
     def end_date(self):
         source_key = self.elements_fields['end-date']
         # If there's no end date listed, but there is a start date, and if the start year is earlier than the current year, we want to return the end of the start year
-        if (not self.data[source_key]) or pd.isna(self.data[source_key]) or (self.data[source_key] in ['Ongoing', 'Term not Known']):
+        if is_empty(self.data[source_key]) or (self.data[source_key] in ['Ongoing', 'Term not Known']):
             start_date_key = self.elements_fields['start-date']
-            if not self.data[start_date_key] or pd.isna(self.data[start_date_key]):
+            if is_empty(self.data[start_date_key]):
                 return
             return self.convert_date(self.data[start_date_key], start_date=False, year_end=True)
         return self.convert_date(self.data[source_key], False)
@@ -434,12 +580,18 @@ class ElementsMetadataRow:
 
 class ElementsPersonList:
     '''Represents one or more rows of persons (expanded) data for import into Elements'''
+    __slots__ = ('parser', 'persons', 'user', 'user_key')
     
     def __init__(self, persons: dict[str, str], parser: AuthorParser, user: Optional[dict[str, str]]=None):
         '''persons should be a mapping from an Elements field of type "person" or "person-list" to a string representing one or more persons. If user is supplied, the name will be added to the parsed list of personal names.'''
         self.parser = parser
         self.persons = persons
         self.user = user
+        if user:
+            # Precompute the parts of the user's name compared against each parsed name: surname, first name, and initials
+            first_name = user.get('first_name', '')
+            initials = first_name[:1] + user['middle_name'][:1] if user.get('middle_name') else first_name[:1]
+            self.user_key = (user.get('last_name'), first_name, initials.upper())
     
     def __iter__(self):
         for _type, name_str in self.persons.items():
@@ -451,54 +603,47 @@ class ElementsPersonList:
 
     def check_name_matches(self, parsed_name: Author) -> bool:
         '''Checks whether the parts of the provided user name match the parts of the provided parsed name. Surname must match, plus either first name or initials'''
-        if self.user['last_name'] == ' '.join(parsed_name.last_name):
-            # Case 1: first name is present, matches on all parts or first part (space-separated)
-            if parsed_name.first_name:
-                if (self.user['first_name'] == ' '.join(parsed_name.first_name)) or (self.user['first_name'] == parsed_name.first_name[0]):
-                    return True   
-            # If no first name in the parsed name, check initials  
-            else: 
-                if self.user.get('middle_name'):
-                    initials = (self.user['first_name'][0] + self.user['middle_name'][0]).upper()
-                else:
-                    initials = self.user['first_name'][0].upper()
-                # Case 2: First- and middle-initial match, or just first initial
-                if parsed_name.initials:
-                    if (initials == ''.join(parsed_name.initials)) or (initials[0] == parsed_name.initials[0]):
-                        return True
+        last_name, first_name, initials = self.user_key
+        if last_name != ' '.join(parsed_name.last_name):
             return False
-
-    def name_to_dict(self, person: Author) -> str:
+        # Case 1: first name is present, matches on all parts or first part (space-separated)
+        if parsed_name.first_name:
+            return (first_name == parsed_name.first_name[0]) or (first_name == ' '.join(parsed_name.first_name))
+        # Case 2: If no first name in the parsed name, check initials: first- and middle-initial match, or just first initial
+        if parsed_name.initials:
+            return (initials == ''.join(parsed_name.initials)) or (initials[:1] == parsed_name.initials[0])
+        return False
+
+    def name_to_dict(self, person: Author) -> dict[str, str]:
         surname = ' '.join(person.last_name)
         first_name = ' '.join(person.first_name)
-        if first_name and person.initials:
-           first_name += ' ' + ''.join(person.initials)
-        elif person.initials:
-            first_name = ''.join(person.initials)
+        # Join the initials once, and only build the combined first name if there are any
+        if initials := ''.join(person.initials):
+            first_name = f'{first_name} {initials}' if first_name else initials
         full_name = f'{first_name} {surname}' if first_name else surname
         return {'first-name': first_name, 'surname': surname, 'full': full_name}
 
+    def user_to_dict(self) -> dict[str, str]:
+        '''Returns a new dict with the parts of the user's name, since callers update the person dicts in place.'''
+        return {'first-name': self.user['first_name'], 
+                'surname': self.user['last_name'], 
+                'full': f'{self.user["first_name"]} {self.user["last_name"]}'}
+
     def parse_names(self, name_str: str) -> Optional[list[dict[str, str]]]:
         '''Parses a string containing multiple person names, returning either a list of dictionaries, where each dictionary contains the parts of the name, or else None, if the string could not be parsed. Match a user's name, if provided, against the parsed names. (Frequently, the user's name will be among those listed in the string.  If the user's name doesn't match the parsed names, append the user's name to the list.) If the string of names cannot be parsed, return only the user's name or None (if no user is provided).'''
         names_to_export = []
         match self.parser.parse_one(name_str):
             # Can't parse name: return user's name
             case None, error if self.user:
-                return [{'first-name': self.user['first_name'], 
-                        'surname': self.user['last_name'], 
-                        'full': f'{self.user["first_name"]} {self.user["last_name"]}'}]
+                return [self.user_to_dict()]
             case result, None if self.user:
                 result = self.parser._post_clean(result)
-                author_matched = False
-                for person in result:
-                    if not author_matched and self.check_name_matches(person):
-                        author_matched = True
-                    names_to_export.append(self.name_to_dict(person))
-                # Append user name if not a match to any of the parsed person names
-                if not author_matched:
-                    names_to_export.append({'first-name': self.user['first_name'], 
-                                            'surname': self.user['last_name'], 
-                                            'full': f'{self.user["first_name"]} {self.user["last_name"]}'})
+                names_to_export = [self.name_to_dict(person) for person in result]
+                # Append user name if not a match to any of the parsed person names (any() stops at the first match)
+                # Most of the names won't be the user's, so rule them out on the surname already joined in name_to_dict, before comparing the other parts
+                surname = self.user_key[0]
+                if not any(name['surname'] == surname and self.check_name_matches(person) for person, name in zip(result, names_to_export)):
+                    names_to_export.append(self.user_to_dict())
             case result, None:
                 names_to_export = [self.name_to_dict(person) for person in self.parser._post_clean(result)]
-        return names_to_export
\ No newline at end of file
+        return names_to_export
@@ -3,6 +3,8 @@ from lark import Lark, Tree, Transformer, v_args, Token
 from lark.visitors import Transformer_InPlace
 from lark.exceptions import UnexpectedCharacters, UnexpectedEOF
 from typing import Iterator, Optional
+from functools import lru_cache, partial
+from concurrent.futures import ProcessPoolExecutor
 from .author_grammar import AUTHOR_GRAMMAR
 import regex
 
@@ -18,6 +20,16 @@ TITLES = r'Professor|Dr\.?|Dean|Mr\.?|Ms.?'
 
 SUFFIXES = r'Jr\.?|III'
 
+# Compiled once for all instances of AuthorParser
+TITLES_RE = regex.compile(TITLES)
+SUFFIXES_RE = regex.compile(SUFFIXES)
+ACRONYMS_RE = regex.compile(ACRONYMS)
+PUNCT_RE = regex.compile(r'[.,;:]$')
+CAPITAL_NAMES_RE = regex.compile(r'[\p{Lu}]{4,}')
+
+# Number of distinct name strings for which parse results are cached on each parser
+PARSE_CACHE_SIZE = 10_000
+
 def score(tree: Tree) -> int:
     '''
     Scores an option by how many children (and grand-children, and
@@ -26,6 +38,13 @@ def score(tree: Tree) -> int:
     '''
     return sum(len(t.children) for t in tree.iter_subtrees())
 
+@lru_cache(maxsize=None)
+def load_parser() -> Lark:
+    '''
+    Builds the Lark parser from the grammar once per process, so that multiple instances of AuthorParser share the same compiled grammar.
+    '''
+    return Lark(AUTHOR_GRAMMAR, start='authors', ambiguity='explicit', regex=True)
+
 class RemoveAmbiguities(Transformer_InPlace):
     '''
     Selects an option to resolve an ambiguity using the score function above.
@@ -38,6 +57,9 @@ class RemoveAmbiguities(Transformer_InPlace):
 class Author:
     '''A class corresponding to a single parsed author name.
     The name_type, derived from the aliases in the grammar, indicates whether the name is 1) in full or initials form, and 2) in regular or last-first order'''
+    # One instance is created per parsed name, so use slots rather than a per-instance __dict__
+    __slots__ = ('type', 'last_first', 'first_name', 'initials', 'last_name')
+
     def __init__(self, name_type: str):
         name_type = name_type.split('_')
         self.type = name_type[1]
@@ -101,19 +123,21 @@ class AuthorParser:
         :param pre_clean: whether to perform pre-parsing steps on the string (removes extraneous punctuation, title cases words in all caps, etc.)
         '''
 
-        self.parser = Lark(AUTHOR_GRAMMAR, start='authors', ambiguity='explicit', regex=True)
+        self.parser = load_parser()
         self.errors = []
         self.parsed = []
         self.corp_auth = set(CORPORATE_AUTHOR_WORDS)
         self.stop_words = set(STOP_WORDS)
-        self.titles = regex.compile(TITLES)
-        self.suffixes = regex.compile(SUFFIXES)
+        self.titles = TITLES_RE
+        self.suffixes = SUFFIXES_RE
+        # The same co-authors recur across many records, so cache the results of parsing each string
+        self._parse_tree = lru_cache(maxsize=PARSE_CACHE_SIZE)(self._parse_tree)
 
         self.pre_clean = pre_clean
         if pre_clean:
-            self.punct = regex.compile(r'[.,;:]$')
-            self.acronyms = regex.compile(ACRONYMS)
-            self.capital_names = regex.compile(r'[\p{Lu}]{4,}')
+            self.punct = PUNCT_RE
+            self.acronyms = ACRONYMS_RE
+            self.capital_names = CAPITAL_NAMES_RE
 
     
     def _pre_clean(self, names: str) -> str:
@@ -122,7 +146,7 @@ class AuthorParser:
         if self.punct.search(names):
             names = names[:-1]
         # Remove titles
-        names = regex.sub(self.titles, '', names)
+        names = self.titles.sub('', names)
         # Convert names in all caps to title case
         for name in self.capital_names.findall(names):
             if not self.acronyms.match(name):
@@ -132,8 +156,8 @@ class AuthorParser:
     def _post_clean(self, authors: list[Author]) -> list[Author]:
         '''Does post-parsing cleanup, including merging names for corporate entities into the last_name field'''
         for i, author in enumerate(authors):
-            # Check for corporate author
-            if (self.corp_auth & set(author.last_name)) or  (self.corp_auth & set(author.first_name)):
+            # Check for corporate author (isdisjoint tests the name parts against the set without building a set from them)
+            if not (self.corp_auth.isdisjoint(author.last_name) and self.corp_auth.isdisjoint(author.first_name)):
                 authors[i].last_name = authors[i].first_name + [''.join(authors[i].initials)] + authors[i].last_name
                 # Remove empty initials slot
                 authors[i].last_name = [n for n in authors[i].last_name if n]
@@ -141,7 +165,7 @@ class AuthorParser:
                 authors[i].initials = []
                 continue
             # Check for stop words in author name
-            if (self.stop_words & set(author.last_name)) or (self.stop_words & set(author.first_name)):
+            if not (self.stop_words.isdisjoint(author.last_name) and self.stop_words.isdisjoint(author.first_name)):
                 authors[i].last_name = []
             # Check for initial titles
             # If we have only title and last name, the name will be blank
@@ -166,22 +190,43 @@ class AuthorParser:
         '''
         if self.pre_clean:
             names = self._pre_clean(names)
+        tree, error = self._parse_tree(names.strip())
+        if error:
+            return None, dict(error)
+        # Unpack a new set of Author instances each time, since these are modified by _post_clean
+        return Author.unpack_tree(tree), None
+
+    def _parse_tree(self, names: str) -> tuple[Optional[Tree], Optional[dict[str, str]]]:
+        '''Parses the string, resolving any ambiguities, and returns the tree, or the error if the string could not be parsed. Cached per instance (see __init__).'''
         try:
-            tree = self.parser.parse(names.strip())
-            tree = RemoveAmbiguities().transform(tree)
-            return Author.unpack_tree(tree), None
+            tree = self.parser.parse(names)
+            return RemoveAmbiguities().transform(tree), None
         except (UnexpectedCharacters, UnexpectedEOF) as e:
             return None, { 'error': str(e) }
 
-    def parse_many(self, list_of_names: list[str]) -> Iterator[dict[int, list[Author]]]:
+    def parse_many(self, list_of_names: list[str], workers: int=None) -> Iterator[dict[int, list[Author]]]:
         '''
         Given a list of strings representing multiple author names, parse the names using the associated grammar. Names are emitted as instances of the Author class, one list per string. Unparsed strings, with errors, are stored on the class instance. Keys of the return dictionary correspond to the index of the string in the original list.
+        If more than one worker is requested, the strings are parsed in chunks in separate processes; results are emitted in the same order either way.
         '''
-        for i, names in enumerate(list_of_names):
-            result, error = self.parse_one(names)
+        if workers and workers > 1:
+            list_of_names = list(list_of_names)
+            chunk_size = max(-(-len(list_of_names) // workers), 1)
+            chunks = [list_of_names[i:i + chunk_size] for i in range(0, len(list_of_names), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = [r for chunk in executor.map(partial(parse_chunk, pre_clean=self.pre_clean), chunks) for r in chunk]
+        else:
+            results = map(self.parse_one, list_of_names)
+        for i, (result, error) in enumerate(results):
             if result:
                 yield {i: self._post_clean(result)}
             else:
                 error.update({'index': i})
                 self.errors.append(error)
            
+
+
+def parse_chunk(list_of_names: list[str], pre_clean: bool=True) -> list[tuple[Optional[list[Author]], Optional[dict[str, str]]]]:
+    '''Parses each string in a worker process for AuthorParser.parse_many, returning the results of parse_one in order.'''
+    parser = AuthorParser(pre_clean)
+    return [parser.parse_one(names) for names in list_of_names]
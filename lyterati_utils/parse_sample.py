@@ -16,13 +16,14 @@ def cli():
 @click.option('--size', default=500)
 @click.option('--output', default=None)
 @click.option('--errors', default='./unparsed_names.json')
-def parse_sample(input, size, output, errors):
+@click.option('--workers', default=1, help='Number of processes to parse the names with')
+def parse_sample(input, size, output, errors, workers):
     with open(input) as f:
         names = [line for line in f]
     parser = AuthorParser()
     names = names[:size] if size > 0 else names
     parsed_output = []
-    for parsed in parser.parse_many(names):
+    for parsed in parser.parse_many(names, workers=workers):
         i, result = parsed.popitem()
         parsed_output.append({'index': i, 
                             'original': names[i].strip(),
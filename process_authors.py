@@ -1,4 +1,4 @@
-from lyterati_utils.elements_types import ElementsPersonList
+from lyterati_utils.elements_types import ElementsPersonList, is_empty
 from lyterati_utils.name_parser import AuthorParser
 import click
 import multiprocess as mp
@@ -14,82 +14,123 @@ logging.captureWarnings(True)
 
 ELEMENTS_FIELD_MAP = {'authors': 'authors'} # Map from Lyterati column name to Elements underlying field
 TIMEOUT = 25 # in seconds
+USER_NAME_FIELDS = ('first_name', 'middle_name', 'last_name')
+CHUNK_SIZE = 32 # rows parsed by a pool worker at a time; kept small, so that a chunk parses within TIMEOUT, and a chunk that times out costs little to parse again row by row
+READ_CHUNK_SIZE = 10_000 # rows read from the input CSV at a time
+
+# Parser for each pool worker, created once per process by _init_worker
+_worker_parser = None
 
 def _parse_process(conn: mp.Pipe): 
     '''
     Runs a loop (intended for a separate process) to parse strings with an instance of ElementsPersonList. Sends results over the provided instance of multiprocess.Pipe
-    data sent over the pipe should be a tuple containing a dict mapping an Elements field to author names and a dict with the user's information
+    data sent over the pipe should be a tuple containing a dict mapping an Elements field to author names and a dict with the user's information, or None to stop the loop
     '''
     parser = AuthorParser()
-    while True:
-        data = conn.recv()
-        match data:
-            case True:
-                #logger.info('Starting new process!')
-                continue
-            case False:
-                return
-            case (persons, user):
-                person_list = ElementsPersonList(persons, parser, user)
-                conn.send(list(person_list))
+    while (data := conn.recv()) is not None:
+        persons, user = data
+        conn.send(list(ElementsPersonList(persons, parser, user)))
+
+def _init_worker():
+    global _worker_parser
+    _worker_parser = AuthorParser()
+
+def _parse_batch(batch: list[tuple[dict[str, str], dict[str, str]]]) -> list[list[dict[str, str]]]:
+    '''
+    Parses a chunk of rows in a pool worker. Each row should be a tuple containing a dict mapping an Elements field to author names and a dict with the user's information. Returns the list of persons for each row, in order.
+    '''
+    return [ list(ElementsPersonList(persons, _worker_parser, user)) for persons, user in batch ]
 
 def load_author_user_data(file: str, author_col) -> Iterator[tuple]:
-    '''Loads preprocessed data for migration from a CSV, which should include the elements_id (object ID) as a column. Yields tuples of the relevant columns.'''
-    df = pd.read_csv(file)
-    df = df[[author_col, 'first_name', 'middle_name', 'last_name', 'elements_id']]
-    p_bar = tqdm(df.itertuples(index=False), total=len(df))
+    '''Loads preprocessed data for migration from a CSV, which should include the elements_id (object ID) as a column. Yields tuples of the relevant columns.
+    Only those columns are read, a chunk of rows at a time. They are read as strings, so that ID's consisting only of digits keep any leading zeros.'''
+    columns = [author_col, 'first_name', 'middle_name', 'last_name', 'elements_id']
+    p_bar = tqdm(unit=' rows')
     p_bar.set_description(f'Processing persons from {file}')
-    for t in p_bar:
-        yield t
+    for chunk in pd.read_csv(file, usecols=columns, dtype=str, chunksize=READ_CHUNK_SIZE):
+        # Keep the column order expected by parse_persons, whatever the order in the file
+        for t in chunk[columns].itertuples(index=False):
+            yield t
+        p_bar.update(len(chunk))
+    p_bar.close()
     
 def user_to_person(user: dict[str, str], fixed_data: dict[str, str]) -> dict[str, str]:
-    user_data = {'first-name': user['first_name'], 
-            'surname': user['last_name'], 
-            'full': f'{user["first_name"]} {user["last_name"]}'
-            }
-    user_data.update(fixed_data)
-    return user_data
+    first_name, last_name = user['first_name'], user['last_name']
+    return {'first-name': first_name, 
+            'surname': last_name, 
+            'full': f'{first_name} {last_name}',
+            **fixed_data}
 
-def parse_persons(file: str, key_column: str='authors', category: str='publication') -> Tuple[List[dict], List[str]]:
-    '''Runs the parser as a process that can be timed out to prevent the bug that consumes all available memory.
-    key_column should match a key in ELEMENTS_FIELD_MAPPING, corresponding to a column in the Lyterati report data.'''
+def with_fixed_data(person_rows: list[dict[str, str]], user: dict[str, str], fixed_data: dict[str, str]) -> list[dict[str, str]]:
+    '''Adds the fixed data to each parsed person, or returns only the user if no persons were parsed.'''
+    if not person_rows:
+        return [user_to_person(user, fixed_data)]
+    for person in person_rows:
+        person.update(fixed_data)
+    return person_rows
+
+def parse_rows_singly(rows: list[tuple], results: list[list[dict]]) -> list[dict[str, str]]:
+    '''Runs the parser as a process that can be timed out on each row, to isolate the row(s) that trigger the bug that consumes all available memory. Results are stored in results by the index of each row. Returns the persons strings of the rows that timed out.'''
     timeouts = []
-    succeeded = []
     main, worker = mp.Pipe()
     proc = mp.Process(target=_parse_process, args=(worker,))
     proc.start()
-    main.send(True)
+    for i, persons, user, fixed_data in rows:
+        main.send((persons, user))
+        if main.poll(TIMEOUT):
+            results[i] = with_fixed_data(main.recv(), user, fixed_data)
+        else:
+            proc.terminate()
+            timeouts.append(persons)
+            results[i] = [user_to_person(user, fixed_data)]
+            proc = mp.Process(target=_parse_process, args=(worker,))
+            proc.start()
+    main.send(None)
+    return timeouts
+
+def parse_persons(file: str, key_column: str='authors', category: str='publication') -> Tuple[List[dict], List[str]]:
+    '''Runs the parser in a pool of processes, over chunks of rows. If a chunk times out (because of the bug that consumes all available memory), the pool is stopped, and the rows in that chunk are parsed one at a time in a process that can be timed out, before the remaining chunks are parsed in a new pool.
+    key_column should match a key in ELEMENTS_FIELD_MAPPING, corresponding to a column in the Lyterati report data.'''
+    el_key = ELEMENTS_FIELD_MAP[key_column]
+    # The persons for each row, in the order of the rows; None until parsed
+    results = []
+    # Rows with an author string to parse: the index of the row in results, and the data for parsing
+    to_parse = []
     for data in load_author_user_data(file, key_column):
         data = data._asdict()
         # Skip rows without an ID
-        if not data['elements_id'] or pd.isna(data['elements_id']):
+        if is_empty(data['elements_id']):
             continue
-        el_key = ELEMENTS_FIELD_MAP[key_column]
-        user = { k:v for k,v in data.items() if k in ['first_name', 'middle_name', 'last_name'] if v and not pd.isna(v)}
+        user = { k: data[k] for k in USER_NAME_FIELDS if not is_empty(data[k]) }
         fixed_data = {'id': data['elements_id'],
                      'category': category,
                      'field-name': el_key}
         # If no author string to parse, just add the user and move on
-        if not data[key_column] or pd.isna(data[key_column]):
-            succeeded.append(user_to_person(user, fixed_data))
+        if is_empty(data[key_column]):
+            results.append([user_to_person(user, fixed_data)])
             continue
-        persons = { el_key: data[key_column] }
-        main.send((persons, user))
-        if main.poll(TIMEOUT):
-            person_rows = main.recv()
-            for person in person_rows:
-                person.update(fixed_data)
-            if not person:
-                person_rows = [user_to_person(user, fixed_data)]
-            succeeded.extend(person_rows)
-        else:
-            proc.terminate()
-            timeouts.append(persons)
-            succeeded.append(user_to_person(user, fixed_data))
-            proc = mp.Process(target=_parse_process, args=(worker,))
-            proc.start()
-            main.send(True)
-    main.send(False)
+        to_parse.append((len(results), { el_key: data[key_column] }, user, fixed_data))
+        results.append(None)
+    timeouts = []
+    chunks = [ to_parse[i:i + CHUNK_SIZE] for i in range(0, len(to_parse), CHUNK_SIZE) ]
+    while chunks:
+        # Leaving the with block terminates the pool, including any worker still parsing
+        with mp.Pool(initializer=_init_worker) as pool:
+            batches = pool.imap(_parse_batch, [ [ (persons, user) for _, persons, user, _ in chunk ] for chunk in chunks ])
+            for n, chunk in enumerate(chunks):
+                try:
+                    # The limit for a single row, not scaled by the chunk size, so that a runaway parse is stopped as soon as before
+                    person_lists = batches.next(TIMEOUT)
+                except mp.TimeoutError:
+                    logger.warning(f'Timed out parsing a chunk of {len(chunk)} rows; parsing its rows one at a time, and restarting the pool for the {len(chunks) - n - 1} remaining chunks.')
+                    break
+                for (i, _, user, fixed_data), person_rows in zip(chunk, person_lists):
+                    results[i] = with_fixed_data(person_rows, user, fixed_data)
+            else:
+                break
+        timeouts.extend(parse_rows_singly(chunks[n], results))
+        chunks = chunks[n + 1:]
+    succeeded = [ person for person_rows in results for person in person_rows ]
     return succeeded, timeouts
 
 @click.command()
@@ -19,4 +19,22 @@ class TestAuthorParser:
             if result:
                 result = author_parser._post_clean(result)
                 assert ';'.join([f'{i+1}_{author.name}' for i, author in enumerate(result)]) == test['parsed_result']
-            assert error is None, error
\ No newline at end of file
+            assert error is None, error
+
+    def test_cached_parse(self, author_tests, author_parser):
+        original_string = author_tests[0]['original_string']
+        first, _ = author_parser.parse_one(original_string)
+        author_parser._post_clean(first)
+        second, _ = author_parser.parse_one(original_string)
+        # Second parse comes from the cache, but yields new Author instances
+        assert author_parser._parse_tree.cache_info().hits == 1
+        assert all(a is not b for a, b in zip(first, second))
+        assert [a.name for a in author_parser._post_clean(second)] == [a.name for a in first]
+
+    def test_parse_many_workers(self, author_tests, author_parser):
+        names = [test['original_string'] for test in author_tests] + ['(unparseable']
+        serial = [(i, [a.name for a in result]) for parsed in author_parser.parse_many(names) for i, result in parsed.items()]
+        parallel_parser = AuthorParser()
+        parallel = [(i, [a.name for a in result]) for parsed in parallel_parser.parse_many(names, workers=2) for i, result in parsed.items()]
+        assert parallel == serial
+        assert [e['index'] for e in parallel_parser.errors] == [e['index'] for e in author_parser.errors]
@@ -0,0 +1,127 @@
+import pytest
+import os
+import shutil
+import pandas as pd
+import openpyxl
+import data_migrator
+from data_migrator import load_reports, save_data, load_data, save_import_files, load_ids_from_profiles
+from lyterati_utils.elements_types import ElementsObjectID, ElementsMapping, SourceHeading
+from lyterati_utils.name_parser import AuthorParser
+from tests.rows_fixtures import ACTIVITIES
+from datetime import date, datetime
+
+
+@pytest.fixture()
+def committee_reports(tmp_path):
+    reports_dir = tmp_path / 'reports'
+    reports_dir.mkdir()
+    # A year column with a null in one report, and text in another report of the same category
+    (reports_dir / 'GWSB Committees.csv').write_text('First Name,Last Name,Committee,End Year,Meeting Time\nAnn,Lee,Budget,2014,10:00\nBo,Kim,Audit,,14:30\n')
+    (reports_dir / 'SPH Committees.csv').write_text('First Name,Last Name,Committee,End Year\nCy,Ng,Ethics,Ongoing\n')
+    # Date cells, and a boolean column with a blank
+    workbook = openpyxl.Workbook()
+    workbook.active.append(['First Name', 'Last Name', 'Committee', 'Start Date', 'Chair'])
+    workbook.active.append(['Di', 'Ruiz', 'Library', datetime(2014, 1, 1), True])
+    workbook.active.append(['Ed', 'Park', 'Senate', datetime(2019, 9, 1), None])
+    workbook.save(reports_dir / 'CCAS Committees.xlsx')
+    return reports_dir
+
+@pytest.fixture()
+def activity_import_rows():
+    mapping = ElementsMapping('./tests/activity-mapping.csv', ElementsObjectID(), AuthorParser(), user_id_field='gw_id', path_to_choice_lists='./tests/activities-choice-list.xlsx', object_privacy='internal,false')
+    metadata, linking, persons = [], [], []
+    for _input in ACTIVITIES:
+        row = mapping.make_mapped_row(dict(_input), SourceHeading.SERVICE)
+        metadata.append(dict(row))
+        linking.append(row.link)
+        persons.extend(row.persons)
+    return metadata, linking, persons
+
+@pytest.fixture()
+def profile_xml(tmp_path, monkeypatch):
+    path = tmp_path / 'fis_faculty.xml'
+    shutil.copy('./tests/fis_faculty.xml', path)
+    monkeypatch.setitem(data_migrator.CONFIG, 'id_source', str(path))
+    return path
+
+class TestProfileIDs:
+
+    def test_cache_reused(self, profile_xml, monkeypatch):
+        ids = load_ids_from_profiles()
+        assert profile_xml.with_suffix('.parquet').exists()
+        # The XML isn't parsed again
+        monkeypatch.delattr(data_migrator.etree, 'iterparse')
+        pd.testing.assert_frame_equal(load_ids_from_profiles(), ids, check_dtype=False)
+
+    def test_cache_replaced_with_same_mtime(self, profile_xml):
+        assert load_ids_from_profiles().gw_id.tolist() == ['G123456789']
+        # A different file copied over the original, keeping its modification time
+        stat = profile_xml.stat()
+        profile_xml.write_text(profile_xml.read_text().replace('G123456789', 'G1234567890'))
+        os.utime(profile_xml, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert load_ids_from_profiles().gw_id.tolist() == ['G1234567890']
+
+    def test_cache_truncated(self, profile_xml):
+        load_ids_from_profiles()
+        # As left by an interrupted write
+        cache = profile_xml.with_suffix('.parquet')
+        cache.write_bytes(cache.read_bytes()[:100])
+        assert load_ids_from_profiles().gw_id.tolist() == ['G123456789']
+        # The cache is replaced with a complete copy
+        assert pd.read_parquet(cache).gw_id.tolist() == ['G123456789']
+        assert not cache.with_name(cache.name + '.tmp').exists()
+
+    def test_cache_not_writable(self, profile_xml, monkeypatch):
+        def write_table(*args, **kwargs):
+            raise PermissionError('Read-only file system')
+        monkeypatch.setattr(data_migrator.pq, 'write_table', write_table)
+        assert load_ids_from_profiles().gw_id.tolist() == ['G123456789']
+
+class TestPreparedReports:
+
+    @pytest.mark.parametrize('engine', ['openpyxl', 'calamine'])
+    def test_prepared_csv_ids(self, committee_reports, tmp_path, monkeypatch, engine):
+        if engine == 'calamine':
+            pytest.importorskip('python_calamine')
+        monkeypatch.setattr(data_migrator, 'EXCEL_ENGINE', engine)
+        reports = load_reports(str(committee_reports), map_report_types=False)
+        save_data(reports, tmp_path / 'prepared.csv')
+        text = (tmp_path / 'prepared.csv').read_text()
+        # Formatted as by pandas' NumPy-backed readers
+        assert 'Di,Ruiz,Library,2014-01-01,1.0,' in text
+        assert 'Ann,Lee,Budget,,,GWSB,Committees,2014.0,10:00\n' in text
+        records = pd.read_csv(tmp_path / 'prepared.csv').to_dict('records')
+        # Object IDs are minted from the prepared CSV, so these must not change between versions
+        minter = ElementsObjectID()
+        assert [minter.mint_id(record.values()) for record in records] == ['94a2a488', '95b3ca81', '98f56a37', 'b3cb448e', '8c5cf864']
+
+    def test_parquet_and_csv_ids(self, tmp_path):
+        df = pd.DataFrame({'name': pd.array(['Budget', None, 'Ethics'], dtype='string[pyarrow]'),
+                           'end_year': pd.array([2014, None, 2020], dtype='int64[pyarrow]'),
+                           'start_year': [2010.0, None, 2019.0],
+                           'count': [1, 2, 3],
+                           'active': [True, False, True],
+                           'approved': pd.array([True, None, False], dtype='bool[pyarrow]'),
+                           'start_date': pd.array([date(2014, 1, 1), None, date(2020, 9, 1)], dtype='date32[pyarrow]'),
+                           'school_code': pd.Categorical(['GWSB', 'SPH', 'GWSB'])})
+        path = tmp_path / 'prepared.csv'
+        save_data(df, path)
+        from_csv = pd.read_csv(path).to_dict('records')
+        from_parquet = load_data(str(path.with_suffix('.parquet'))).to_dict('records')
+        assert [ElementsObjectID.hash_values(row.values()) for row in from_parquet] == [ElementsObjectID.hash_values(row.values()) for row in from_csv]
+
+class TestImportFiles:
+
+    def test_import_file_format(self, activity_import_rows, tmp_path):
+        save_import_files(activity_import_rows, SourceHeading.SERVICE, tmp_path)
+        for name, rows in zip(['metadata', 'linking', 'persons'], activity_import_rows):
+            text = (tmp_path / f'activities-{name}.csv').read_text()
+            # Headers and strings are unquoted, and None is blank, as written by pandas
+            assert '"' not in text.splitlines()[0]
+            assert text == pd.DataFrame.from_records(rows).to_csv(index=False)
+        # A column with values of mixed types doesn't change the format of the other columns
+        metadata = activity_import_rows[0]
+        mixed = [{**row, 'x': i if i % 2 else str(i)} for i, row in enumerate(metadata)]
+        save_import_files([mixed, [], []], SourceHeading.SERVICE, tmp_path)
+        text = (tmp_path / 'activities-metadata.csv').read_text()
+        assert text == pd.DataFrame.from_records(mixed).to_csv(index=False)
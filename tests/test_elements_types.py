@@ -1,48 +1,54 @@
 import pytest
-from lyterati_utils.elements_types import SourceHeading, ElementsObjectID, ElementsMapping, LinkType, ElementsPersonList
+from lyterati_utils.elements_types import SourceHeading, ElementsObjectID, DeferredObjectID, ElementsMapping, LinkType, ElementsPersonList
 from lyterati_utils.name_parser import AuthorParser
 import pandas as pd
 from tests.rows_fixtures import ACTIVITIES, TEACHING_ACTIVITIES, PUBLICATIONS
 from datetime import datetime
-
-
-@pytest.fixture()
+from types import MappingProxyType
+
+# Shared by every test, so read-only
+SEED = MappingProxyType({'college_name': 'School of Pub Hlth & Hlth Serv',
+                         'department_name': 'Biostatistics&Bioinformatics',
+                         'last_name': 'Krandall',
+                         'first_name': 'Heath',
+                         'heading_type': 'Digital Media',
+                         'contribution_year': '2014',
+                         'additional_details': pd.NA,
+                         'url': 'https://www.genomeweb.com/informatics/uniconnect-donates-lab-management-software-gw-comp-bio-institute',
+                         'school_code': 'old_SPH',
+                         'report_code': 'Media Contributions',
+                         'category': 'Service',
+                         'service_heading': 'Media Contributions',
+                         'name': 'GenomeWeb',
+                         'collaborators': pd.NA,
+                         'middle_name': 'A',
+                         'gw_id': 'G9999991'})
+
+USER = MappingProxyType({'first_name': 'Heath', 
+                         'last_name': 'Krandall',
+                         'middle_name': 'A',
+                         'gw_id': 'G99999991'})
+
+
+@pytest.fixture(scope='session')
 def activity_inputs():
     return ACTIVITIES
 
-@pytest.fixture()
+@pytest.fixture(scope='session')
 def teaching_activity_inputs():
     return TEACHING_ACTIVITIES
 
-@pytest.fixture()
+@pytest.fixture(scope='session')
 def publication_inputs():
     return PUBLICATIONS
 
-@pytest.fixture()
+@pytest.fixture(scope='session')
 def seed():
-    return {'college_name': 'School of Pub Hlth & Hlth Serv',
-            'department_name': 'Biostatistics&Bioinformatics',
-            'last_name': 'Krandall',
-            'first_name': 'Heath',
-            'heading_type': 'Digital Media',
-            'contribution_year': '2014',
-            'additional_details': pd.NA,
-            'url': 'https://www.genomeweb.com/informatics/uniconnect-donates-lab-management-software-gw-comp-bio-institute',
-            'school_code': 'old_SPH',
-            'report_code': 'Media Contributions',
-            'category': 'Service',
-            'service_heading': 'Media Contributions',
-            'name': 'GenomeWeb',
-            'collaborators': pd.NA,
-            'middle_name': 'A',
-            'gw_id': 'G9999991'}
+    return SEED
 
-@pytest.fixture()
+@pytest.fixture(scope='session')
 def user():
-    return {'first_name': 'Heath', 
-            'last_name': 'Krandall',
-            'middle_name': 'A',
-            'gw_id': 'G99999991'}
+    return USER
 
 @pytest.fixture()
 def minter(seed):
@@ -50,10 +56,11 @@ def minter(seed):
     minter.mint_id(seed.values())
     return minter
 
-@pytest.fixture()
+@pytest.fixture(scope='session')
 def parser():
     return AuthorParser()
 
+# The mappings take the minter, so are made for each test; the mapping sheets and choice lists they load are cached by load_mapping_sheet and load_choice_lists
 @pytest.fixture()
 def activity_mapping(minter, parser):  
     return ElementsMapping('./tests/activity-mapping.csv', minter, parser, user_id_field='gw_id', path_to_choice_lists='./tests/activities-choice-list.xlsx')
@@ -88,6 +95,10 @@ def person_without_user(parser):
 def single_person_without_user(parser):
     return ElementsPersonList({'co-contributors': 'Maribelle Merriweather'}, parser)
 
+@pytest.fixture()
+def person_with_user(parser, user):
+    return ElementsPersonList({'authors': 'Krandall, HA, Smith, J'}, parser, user)
+
 
 class TestElementsMapping:
 
@@ -119,6 +130,30 @@ class TestElementsObjectID:
         new_row = activity_inputs[1]
         assert minter.mint_id(new_row.values()) == id2        
 
+    def test_deferred_ids(self, seed, activity_inputs):
+        minter, deferred_minter = ElementsObjectID(), DeferredObjectID()
+        minter.mint_id(seed.values())
+        ids = [minter.mint_id(row.values()) for row in activity_inputs]
+        # Deferred hashes, exchanged in the same order, yield the same IDs
+        other_minter = ElementsObjectID()
+        other_minter.id_for_hash(deferred_minter.mint_id(seed.values()))
+        assert [other_minter.id_for_hash(deferred_minter.mint_id(row.values())) for row in activity_inputs] == ids
+
+    def test_parquet_store(self, seed, tmp_path):
+        minter = ElementsObjectID()
+        minter.mint_id(seed.values())
+        minter.path_to_id_store = tmp_path / 'unique-ids.parquet'
+        minter.persist_ids()
+        assert ElementsObjectID(minter.path_to_id_store).used == minter.used
+
+    def test_csv_store(self, tmp_path):
+        minter = ElementsObjectID()
+        minter.used = {'a' * 64: '012345', 'b' * 64: '123456'}
+        minter.path_to_id_store = tmp_path / 'unique-ids.csv'
+        minter.persist_ids()
+        # ID's that look like numbers are read back unchanged
+        assert ElementsObjectID(minter.path_to_id_store).used == minter.used
+
 class TestElementsActivityMetadata:
 
     def test_activity_row_attributes(self, activity_rows):
@@ -140,6 +175,10 @@ class TestElementsActivityMetadata:
         activity_rows[1].data['contribution_year'] = datetime.now().year
         mapped_dict = dict(activity_rows[1])
         assert mapped_dict['end-date'] is None
+        # Missing values from Arrow-backed columns are pd.NA
+        activity_rows[1].data['contribution_year'] = pd.NA
+        mapped_dict = dict(activity_rows[1])
+        assert mapped_dict['end-date'] is None and 'start-date' not in mapped_dict
     
     def test_choice_constraint(self, activity_rows):
         mapped_dict = dict(activity_rows[3])
@@ -180,6 +219,12 @@ class TestElementsActivityMetadata:
     def test_single_person_to_parse(self, single_person_without_user):
         assert list(single_person_without_user) == [{'first-name': 'Maribelle', 'surname': 'Merriweather', 'full': 'Maribelle Merriweather', 'field-name': 'co-contributors'}]
 
+    def test_user_name_matches(self, person_with_user, parser):
+        # Initials and surname match the user, who should not be appended to the list
+        assert [p['full'] for p in person_with_user] == ['HA Krandall', 'J Smith']
+        matches = [person_with_user.check_name_matches(a) for a in parser._post_clean(parser.parse_one('Heath Krandall, H Krandall, Heath Smith')[0])]
+        assert matches == [True, True, False]
+
         
 class TestElementsTeachingActivityMetadata:
 